@@ -0,0 +1,195 @@
+# قياس أداء واجهات البرمجة داخل العملية
+# In-process API benchmark with a regression check
+#
+# Drives server.app through httpx's ASGI transport (no network), with the
+# fake LLM and in-memory storage from stubs.py, and reports ops/sec and
+# p50/p95/p99 latency per route. Results are compared with a saved JSON
+# baseline; the run exits with status 1 when any route is slower than the
+# baseline by more than the threshold.
+#
+#   cd backend
+#   python benchmarks/bench_api.py --update-baseline   # record a baseline
+#   python benchmarks/bench_api.py                     # compare against it
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+# Before server is imported: no real storage, a throwaway explanation cache
+os.environ["STORAGE_BACKEND"] = "none"
+os.environ.setdefault("EXPLANATION_CACHE_PATH", str(Path(tempfile.mkdtemp()) / "explanation_cache.db"))
+
+import logging  # noqa: E402
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("bench_api.py needs httpx: pip install httpx")
+
+import server  # noqa: E402
+import stubs  # noqa: E402
+from payloads import GENDER_PAYLOADS, GENETIC_PAYLOADS, TRAITS_PAYLOADS  # noqa: E402
+
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+# name -> (method, path, query params or None, JSON bodies or None)
+ROUTES = {
+    "predict-gender": ("POST", "/api/predict-gender", None, GENDER_PAYLOADS),
+    "predict-traits": ("POST", "/api/predict-traits", None, TRAITS_PAYLOADS),
+    "predict-genetic-diseases": ("POST", "/api/predict-genetic-diseases", None, GENETIC_PAYLOADS),
+    "history": ("GET", "/api/history", [{"limit": 50}, {"limit": 50, "type": "gender", "compact": "true"}], None),
+    "statistics": ("GET", "/api/statistics", [{}], None),
+}
+
+
+def percentile(latencies, p: float) -> float:
+    """Nearest-rank percentile of sorted latencies, in milliseconds"""
+    index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+    return round(latencies[index] * 1000, 3)
+
+
+async def bench_route(client: httpx.AsyncClient, name: str, requests: int, concurrency: int, warmup: int) -> dict:
+    method, path, params, bodies = ROUTES[name]
+    variants = [{"params": p} for p in params] if params else [{"json": body} for body in bodies]
+    latencies = []
+    errors = 0
+
+    async def one(index: int, record: bool):
+        nonlocal errors
+        started = time.perf_counter()
+        response = await client.request(method, path, **variants[index % len(variants)])
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            errors += 1
+        if record:
+            latencies.append(elapsed)
+
+    async def worker(start: int, count: int, record: bool):
+        for index in range(start, start + count):
+            await one(index, record)
+
+    async def run(total: int, record: bool):
+        share, extra = divmod(total, concurrency)
+        tasks, start = [], 0
+        for worker_index in range(concurrency):
+            count = share + (1 if worker_index < extra else 0)
+            tasks.append(worker(start, count, record))
+            start += count
+        await asyncio.gather(*tasks)
+
+    await run(warmup, record=False)
+    started = time.perf_counter()
+    await run(requests, record=True)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "ops_per_sec": round(requests / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float = 0.5) -> list:
+    """
+    Regressions: lower throughput or higher p95 than baseline by more than
+    threshold. A p95 must also grow by min_delta_ms, so sub-millisecond
+    jitter is not reported.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("routes", {}).get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: {result['ops_per_sec']} ops/sec vs baseline {base['ops_per_sec']}")
+        if result["p95_ms"] > max(base["p95_ms"] * (1 + threshold), base["p95_ms"] + min_delta_ms):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+    return regressions
+
+
+async def run_suite(names, requests: int, concurrency: int, warmup: int, seed_records: int, llm_latency_ms: float) -> dict:
+    stubs.install(server, llm=stubs.FakeLlm(median_ms=llm_latency_ms, seed=1))
+    server.db.seed(seed_records)
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return {name: await bench_route(client, name, requests, concurrency, warmup) for name in names}
+    finally:
+        await server.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process API benchmark")
+    parser.add_argument("--routes", nargs="+", choices=list(ROUTES), default=list(ROUTES))
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests per route first")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--seed-records", type=int, default=1000, help="history records in the fake storage")
+    parser.add_argument("--llm-latency-ms", type=float, default=5.0, help="median fake LLM latency")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="save these results as the baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.2")),
+        help="allowed slowdown before failing, as a fraction (0.2 = 20%%)"
+    )
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="smallest p95 increase that counts")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_suite(
+        args.routes, args.requests, args.concurrency, args.warmup, args.seed_records, args.llm_latency_ms
+    ))
+
+    print(f"{'route':<26} {'ops/sec':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<26} {result['ops_per_sec']:>10} {result['p50_ms']:>9} "
+              f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}")
+
+    failed = [name for name, result in results.items() if result["errors"]]
+    if failed:
+        print(f"\nNon-200 responses from: {', '.join(failed)}")
+
+    if args.update_baseline or not args.baseline.exists():
+        report = {
+            "created": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "settings": {
+                "requests": args.requests, "concurrency": args.concurrency,
+                "seed_records": args.seed_records, "llm_latency_ms": args.llm_latency_ms,
+            },
+            "routes": results,
+        }
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+        sys.exit(1 if failed else 0)
+
+    baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\nRegressions over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+    else:
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+    sys.exit(1 if regressions or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
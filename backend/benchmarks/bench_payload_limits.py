@@ -0,0 +1,194 @@
+# قياس تكلفة رفض الطلبات الضخمة
+# Benchmark: cost of refusing oversized prediction payloads
+#
+# Sends oversized requests to /api/predict-gender and the two /batch routes
+# through the app in process and times how they are refused: by declared
+# Content-Length, while streaming in chunks (413), and by list length
+# within the byte cap (422, without echoing the list back). Compares with
+# what validating and ordering a 100k-children request used to cost, and
+# times ordering a family at the list limit.
+#
+#   cd backend && python benchmarks/bench_payload_limits.py [--children 100000]
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import BaseModel  # noqa: E402
+
+import server  # noqa: E402
+
+
+class UnboundedGenderRequest(BaseModel):
+    """GenderPredictionRequest without list limits (the old model)"""
+    current_pregnancy_order: int
+    wife_family_children: List[server.Child]
+    husband_family_children: List[server.Child]
+    language: str = 'ar'
+
+
+def gender_payload(children: int) -> bytes:
+    family = [{"order": order, "gender": "male" if order % 2 else "female"} for order in range(1, children + 1)]
+    return json.dumps({
+        "current_pregnancy_order": 1,
+        "wife_family_children": family,
+        "husband_family_children": family,
+        "language": "en",
+    }).encode()
+
+
+def gender_batch_payload(rows: int) -> bytes:
+    return json.dumps({
+        "current_pregnancy_orders": [1] * rows,
+        "wife_family_patterns": [["male", "female"]] * rows,
+        "husband_family_patterns": [["female", "male"]] * rows,
+    }).encode()
+
+
+def genetic_batch_payload(rows: int) -> bytes:
+    return json.dumps({
+        "wife_family_diseases": [["thalassemia"]] * rows,
+        "husband_family_diseases": [["hemophilia"]] * rows,
+        "genders": ["unknown"] * rows,
+    }).encode()
+
+
+def rows_over(payload, limit: int) -> int:
+    """Smallest row count (doubling) whose body is over `limit` bytes"""
+    rows = 1024
+    while len(payload(rows)) <= limit:
+        rows *= 2
+    return rows
+
+
+def split(body: bytes, chunk_size: int) -> List[bytes]:
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+async def call(path: str, chunks: List[bytes], streamed: bool = False):
+    """POST through the ASGI app; streamed bodies have no Content-Length"""
+    headers = [(b"content-type", b"application/json")]
+    if not streamed:
+        headers.append((b"content-length", str(sum(map(len, chunks))).encode()))
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    consumed = 0
+
+    async def receive():
+        nonlocal consumed
+        if consumed < len(messages):
+            consumed += 1
+            return messages[consumed - 1]
+        return {"type": "http.disconnect"}
+
+    status = None
+    size = 0
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        else:
+            size += len(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench")] + headers, "client": ("bench", 1), "server": ("bench", 80),
+    }
+    await server.app(scope, receive, send)
+    return status, consumed, size
+
+
+def timed(function, repeat: int) -> float:
+    """Best of `repeat` runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--children", type=int, default=100_000, help="children per family in the oversized payload")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    big = gender_payload(args.children)
+    gender_cap = server.BATCH_REQUEST_BYTES["/api/predict-gender/batch"]
+    genetic_cap = server.BATCH_REQUEST_BYTES["/api/predict-genetic-diseases/batch"]
+    # (route, oversized body, body over a list limit but within the byte cap)
+    cases = [
+        ("/api/predict-gender", big, gender_payload(server.MAX_FAMILY_CHILDREN + 1)),
+        ("/api/predict-gender/batch", gender_batch_payload(rows_over(gender_batch_payload, gender_cap)),
+         gender_batch_payload(server.MAX_BATCH_SIZE + 1)),
+        ("/api/predict-genetic-diseases/batch", genetic_batch_payload(rows_over(genetic_batch_payload, genetic_cap)),
+         genetic_batch_payload(server.MAX_BATCH_SIZE + 1)),
+    ]
+    print(f"Limits: MAX_REQUEST_BYTES={server.MAX_REQUEST_BYTES}, MAX_FAMILY_CHILDREN={server.MAX_FAMILY_CHILDREN}, "
+          f"MAX_BATCH_SIZE={server.MAX_BATCH_SIZE}")
+    print(f"Batch byte caps: {server.BATCH_REQUEST_BYTES}\n")
+
+    loop = asyncio.new_event_loop()
+    results = []
+    unexpected = []
+
+    def run(path, chunks, streamed=False):
+        return loop.run_until_complete(call(path, chunks, streamed))
+
+    def check(label, expected, outcome, milliseconds):
+        status, _, size = outcome
+        results.append((label, status, size, milliseconds))
+        if status != expected:
+            unexpected.append(f"{label}: {status}, expected {expected}")
+
+    for path, oversized, over_list in cases:
+        whole, streamed = [oversized], split(oversized, 16 * 1024)
+        megabytes = len(oversized) / 1e6
+        check(f"{path} {megabytes:.1f} MB, Content-Length", 413, run(path, whole),
+              timed(lambda: run(path, whole), args.repeat))
+        outcome = run(path, streamed, streamed=True)
+        check(f"{path} {megabytes:.1f} MB, streamed ({outcome[1]}/{len(streamed)} chunks read)", 413, outcome,
+              timed(lambda: run(path, streamed, streamed=True), args.repeat))
+        check(f"{path} one over the list limit ({len(over_list) / 1e3:.0f} kB)", 422, run(path, [over_list]),
+              timed(lambda: run(path, [over_list]), args.repeat))
+
+    def unbounded():
+        request = UnboundedGenderRequest.model_validate_json(big)
+        sorted(request.wife_family_children, key=lambda x: x.order)
+        sorted(request.husband_family_children, key=lambda x: x.order)
+
+    results.append((f"no limits: validate + sort {args.children} children", None, None, timed(unbounded, args.repeat)))
+    loop.close()
+
+    print(f"  {'request':<82} {'status':>6} {'reply B':>8} {'time':>13}")
+    for label, status, size, milliseconds in results:
+        print(f"  {label:<82} {status if status is not None else '-':>6} "
+              f"{size if size is not None else '-':>8} {milliseconds:10.3f} ms")
+    if unexpected:
+        sys.exit("Unexpected status: " + "; ".join(unexpected))
+
+    print(f"\nOrdering {server.MAX_FAMILY_CHILDREN} children (the most a request can carry):")
+    ordered = [server.Child(order=order, gender="male") for order in range(1, server.MAX_FAMILY_CHILDREN + 1)]
+    shuffled = random.sample(ordered, len(ordered))
+    loops = 10_000
+    for label, children in (("in order", ordered), ("shuffled", shuffled)):
+        milliseconds = timed(
+            lambda: [sorted(children, key=lambda x: x.order) for _ in range(loops)], args.repeat
+        ) / loops
+        print(f"  {label:<10} {milliseconds * 1000:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
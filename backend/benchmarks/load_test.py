@@ -0,0 +1,345 @@
+# اختبار الحمل للخادم
+# Closed-loop load generator
+#
+# Starts `uvicorn stub_server:app` (server:app with a fake LLM and in-memory
+# storage) with the requested number of workers, then drives a weighted mix
+# of the three prediction endpoints from a fixed number of clients. Each
+# client waits for its response before sending the next request; with
+# --rps the clients are also paced to a shared schedule. Reports
+# throughput, error rates, latency histograms and the server's event-loop
+# lag.
+#
+#   cd backend
+#   python benchmarks/load_test.py --workers 2 --concurrency 64 --duration 30
+#   python benchmarks/load_test.py --rps 500 --llm-median-ms 1500 --timeout 5
+#   python benchmarks/load_test.py --url http://localhost:8001   # already running
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("load_test.py needs httpx: pip install httpx")
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from payloads import GENDER_PAYLOADS, GENETIC_PAYLOADS, TRAITS_PAYLOADS  # noqa: E402
+
+ENDPOINTS = {
+    "gender": ("/api/predict-gender", GENDER_PAYLOADS),
+    "traits": ("/api/predict-traits", TRAITS_PAYLOADS),
+    "genetic": ("/api/predict-genetic-diseases", GENETIC_PAYLOADS),
+}
+
+# Latency histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """"gender=5,traits=3,genetic=2" -> normalized weights"""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}, use {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("mix weights must add up to more than 0")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted seconds, in milliseconds"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return round(values[index] * 1000, 2)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = Counter()
+
+    def record(self, latency: float, error: Optional[str]):
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[error] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        histogram = Counter()
+        for latency in latencies:
+            milliseconds = latency * 1000
+            histogram[next(bound for bound in BUCKETS_MS if milliseconds <= bound)] += 1
+        count = len(latencies)
+        errors = sum(self.errors.values())
+        return {
+            "requests": count,
+            "rps": round(count / elapsed, 1) if elapsed else 0,
+            "error_rate": round(errors / count, 4) if count else 0,
+            "errors": dict(self.errors),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+            "histogram_ms": {("inf" if bound == float("inf") else bound): histogram[bound] for bound in BUCKETS_MS},
+        }
+
+
+class LoadGenerator:
+    def __init__(self, url: str, mix: Dict[str, float], concurrency: int, rps: Optional[float],
+                 duration: float, warmup: float, timeout: float, seed: int = 1):
+        self.url = url
+        self.mix = mix
+        self.concurrency = concurrency
+        self.rps = rps
+        self.duration = duration
+        self.warmup = warmup
+        self.timeout = timeout
+        self._random = random.Random(seed)
+        self.stats = {name: EndpointStats() for name in mix}
+        self.client_lag: List[float] = []
+        self.late_sends = 0
+        self.measure_from = 0.0
+        self.measure_until = 0.0
+
+    def _pick(self) -> str:
+        return self._random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+
+    async def _client(self, client: httpx.AsyncClient, schedule: List[float]):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.rps:
+                # Shared schedule: one slot every 1/rps seconds
+                slot = schedule[0]
+                schedule[0] += 1 / self.rps
+                delay = slot - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.01 and loop.time() >= self.measure_from:
+                    self.late_sends += 1
+            now = loop.time()
+            if now >= self.measure_until:
+                return
+            name = self._pick()
+            path, payloads = ENDPOINTS[name]
+            error = None
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=self._random.choice(payloads))
+                if response.status_code != 200:
+                    error = str(response.status_code)
+            except httpx.TimeoutException:
+                error = "timeout"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            latency = time.perf_counter() - started
+            if now >= self.measure_from:
+                self.stats[name].record(latency, error)
+
+    async def _watch_lag(self):
+        """The generator's own loop lag - high values mean the client is the bottleneck"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(0.05)
+            if loop.time() >= self.measure_from:
+                self.client_lag.append(max(0.0, loop.time() - started - 0.05))
+
+    async def run(self) -> float:
+        loop = asyncio.get_running_loop()
+        self.measure_from = loop.time() + self.warmup
+        self.measure_until = self.measure_from + self.duration
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        # httpx writes headers and body separately; without TCP_NODELAY the body
+        # waits for a delayed ACK (~40 ms) on idle connections
+        transport = httpx.AsyncHTTPTransport(
+            limits=limits, socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+        )
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout, transport=transport) as client:
+            schedule = [loop.time()]
+            watcher = asyncio.create_task(self._watch_lag())
+            await asyncio.gather(*(self._client(client, schedule) for _ in range(self.concurrency)))
+            watcher.cancel()
+        return self.duration
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port: int, stats_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "FAKE_LLM_MEDIAN_MS": str(args.llm_median_ms),
+        "FAKE_LLM_SIGMA": str(args.llm_sigma),
+        "FAKE_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "LOADTEST_STATS_DIR": stats_dir,
+        "EXPLANATION_CACHE_PATH": str(Path(stats_dir) / "explanation_cache.db"),
+    })
+    command = [
+        sys.executable, "-m", "uvicorn", "stub_server:app", "--app-dir", str(BENCH_DIR),
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers),
+        "--log-level", "warning", "--no-access-log",
+    ]
+    # Server logs go to a file so they don't interleave with the report
+    log = open(Path(stats_dir) / "server.log", "wb")
+    return subprocess.Popen(command, cwd=str(BENCH_DIR.parent), env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(url: str, process: Optional[subprocess.Popen], log: Optional[Path], timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            sys.exit(f"Server exited with status {process.returncode}, see {log}")
+        try:
+            if httpx.get(f"{url}/api/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    sys.exit(f"Server at {url} not ready after {timeout:.0f}s")
+
+
+def server_loop_lag(stats_dir: str, since: float) -> dict:
+    """Aggregate the lag samples every worker wrote after `since` (wall time)"""
+    lags, workers, llm_calls = [], 0, 0
+    for path in Path(stats_dir).glob("loop-lag-*.json"):
+        data = json.loads(path.read_text())
+        workers += 1
+        llm_calls += data["llm_calls"]
+        lags.extend(lag for at, lag in data["samples"] if at >= since)
+    lags.sort()
+    return {
+        "workers_reporting": workers,
+        "fake_llm_calls": llm_calls,
+        "p50_ms": percentile(lags, 50),
+        "p99_ms": percentile(lags, 99),
+        "max_ms": round(lags[-1] * 1000, 2) if lags else None,
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<10} {'requests':>9} {'rps':>9} {'errors':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<10} {stats['requests']:>9} {stats['rps']:>9} {stats['error_rate']:>8.2%} "
+              f"{stats['p50_ms']!s:>9} {stats['p95_ms']!s:>9} {stats['p99_ms']!s:>9} {stats['max_ms']!s:>9}")
+    total = report["total"]
+    print(f"{'total':<10} {total['requests']:>9} {total['rps']:>9} {total['error_rate']:>8.2%}")
+    if report.get("target_rps"):
+        print(f"\nTarget {report['target_rps']} rps, {report['late_sends']} sends behind schedule")
+
+    print("\nLatency histogram (requests per bucket, ms):")
+    for bound in BUCKETS_MS:
+        key = "inf" if bound == float("inf") else bound
+        counts = "  ".join(f"{name}={stats['histogram_ms'][key]}" for name, stats in report["endpoints"].items())
+        print(f"  <= {key!s:>5}  {counts}")
+
+    for name, stats in report["endpoints"].items():
+        if stats["errors"]:
+            print(f"\nErrors ({name}): {stats['errors']}")
+
+    lag = report.get("server_loop_lag")
+    if lag:
+        print(f"\nServer event-loop lag ({lag['workers_reporting']} workers): "
+              f"p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms; "
+              f"fake LLM calls {lag['fake_llm_calls']}")
+    client = report["client_loop_lag"]
+    print(f"Load generator loop lag: p99 {client['p99_ms']} ms, max {client['max_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load test for the prediction API")
+    parser.add_argument("--url", help="test a server that is already running instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--rps", type=float, help="target requests per second (default: as fast as possible)")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("gender=5,traits=3,genetic=2"),
+                        help="endpoint weights, e.g. gender=5,traits=3,genetic=2")
+    parser.add_argument("--timeout", type=float, default=10, help="client timeout per request (s)")
+    parser.add_argument("--llm-median-ms", type=float, default=800, help="fake LLM median latency")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="fake LLM lognormal spread (0 = constant)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of fake LLM calls that fail")
+    parser.add_argument("--output", type=Path, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    process = None
+    stats_dir = tempfile.mkdtemp(prefix="loadtest-")
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        process = start_server(args, port, stats_dir)
+    try:
+        wait_until_ready(url, process, Path(stats_dir) / "server.log" if process else None)
+        print(f"Load test: {url}, {args.concurrency} clients, "
+              f"{'target ' + str(args.rps) + ' rps' if args.rps else 'unpaced'}, "
+              f"{args.duration:.0f}s after {args.warmup:.0f}s warmup")
+        generator = LoadGenerator(url, args.mix, args.concurrency, args.rps, args.duration, args.warmup, args.timeout)
+        measure_from = time.time() + args.warmup
+        elapsed = asyncio.run(generator.run())
+
+        endpoints = {name: stats.summary(elapsed) for name, stats in generator.stats.items()}
+        requests = sum(stats["requests"] for stats in endpoints.values())
+        errors = sum(sum(stats["errors"].values()) for stats in endpoints.values())
+        client_lag = sorted(generator.client_lag)
+        report = {
+            "settings": {
+                "workers": args.workers if process else None, "concurrency": args.concurrency,
+                "duration": args.duration, "mix": args.mix, "timeout": args.timeout,
+                "llm_median_ms": args.llm_median_ms, "llm_sigma": args.llm_sigma,
+                "llm_error_rate": args.llm_error_rate,
+            },
+            "target_rps": args.rps,
+            "late_sends": generator.late_sends,
+            "total": {
+                "requests": requests,
+                "rps": round(requests / elapsed, 1),
+                "error_rate": round(errors / requests, 4) if requests else 0,
+            },
+            "endpoints": endpoints,
+            "client_loop_lag": {
+                "p99_ms": percentile(client_lag, 99),
+                "max_ms": round(client_lag[-1] * 1000, 2) if client_lag else None,
+            },
+        }
+        if process is not None:
+            time.sleep(1.1)  # let every worker write its latest lag samples
+            report["server_loop_lag"] = server_loop_lag(stats_dir, measure_from)
+        print_report(report)
+        if process is not None:
+            print(f"Server log: {Path(stats_dir) / 'server.log'}")
+        if args.output:
+            args.output.write_text(json.dumps(report, indent=2))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
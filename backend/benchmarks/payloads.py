@@ -0,0 +1,39 @@
+# طلبات نموذجية لقياس الأداء
+# Sample request bodies shared by the benchmarks
+#
+# A few valid variations per prediction endpoint, in both languages, so a
+# run does not measure a single cached answer.
+
+GENDER_PAYLOADS = [
+    {
+        "current_pregnancy_order": order,
+        "wife_family_children": [{"order": i + 1, "gender": gender} for i, gender in enumerate(wife)],
+        "husband_family_children": [{"order": i + 1, "gender": gender} for i, gender in enumerate(husband)],
+        "language": language,
+    }
+    for order, wife, husband, language in (
+        (1, ["male", "female"], ["male", "male"], "ar"),
+        (2, ["female"], ["female"], "en"),
+        (1, ["male", "male", "female"], ["female", "male", "male"], "ar"),
+        (3, ["ذكر", "أنثى", "ذكر"], ["أنثى", "أنثى"], "ar"),
+    )
+]
+
+TRAITS_PAYLOADS = [
+    {
+        "mother_traits": {"hairColor": "black", "eyeColor": "dark_brown", "skinTone": "olive", "height": "tall"},
+        "father_traits": {"hairColor": "brown", "eyeColor": "green", "skinTone": "fair", "height": "average"},
+        "language": "ar",
+    },
+    {
+        "mother_traits": {"hairColor": "blonde", "eyeColor": "blue"},
+        "father_traits": {"hairColor": "red", "skinTone": "dark"},
+        "language": "en",
+    },
+]
+
+GENETIC_PAYLOADS = [
+    {"wife_family_diseases": ["thalassemia"], "husband_family_diseases": ["thalassemia"], "gender": "male", "language": "ar"},
+    {"wife_family_diseases": ["hemophilia", "diabetes"], "husband_family_diseases": [], "gender": "male", "language": "en"},
+    {"wife_family_diseases": ["sickle cell anemia"], "husband_family_diseases": ["G6PD"], "gender": "female", "language": "ar"},
+]
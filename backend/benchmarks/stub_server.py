@@ -0,0 +1,66 @@
+# الخادم مع بدائل محلية لاختبار الحمل
+# server:app with the fake LLM and in-memory storage, for load tests
+#
+#   uvicorn stub_server:app --app-dir benchmarks    (from backend/)
+#
+# Configured from the environment:
+#   FAKE_LLM_MEDIAN_MS, FAKE_LLM_SIGMA, FAKE_LLM_ERROR_RATE  fake LLM latency/errors
+#   STUB_SEED_RECORDS                                       history records to start with
+#   LOADTEST_STATS_DIR   if set, each worker writes its event-loop lag samples
+#                        to loop-lag-<pid>.json there once a second
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ["STORAGE_BACKEND"] = "none"
+
+import server  # noqa: E402
+import stubs  # noqa: E402
+
+app = server.app
+
+fake_llm, memory_db = stubs.install(server, llm=stubs.FakeLlm(
+    median_ms=float(os.getenv("FAKE_LLM_MEDIAN_MS", "800")),
+    sigma=float(os.getenv("FAKE_LLM_SIGMA", "0.5")),
+    error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+))
+memory_db.seed(int(os.getenv("STUB_SEED_RECORDS", "1000")))
+
+STATS_DIR = os.getenv("LOADTEST_STATS_DIR")
+LAG_INTERVAL = 0.05
+
+
+async def monitor_loop_lag(path: Path):
+    """Sample how late a 50 ms sleep wakes up, and write (time, lag) pairs to path"""
+    loop = asyncio.get_running_loop()
+    samples = []
+    last_write = time.time()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append((time.time(), max(0.0, loop.time() - started - LAG_INTERVAL)))
+        if time.time() - last_write >= 1:
+            path.write_text(json.dumps({"llm_calls": fake_llm.calls, "samples": samples}))
+            last_write = time.time()
+
+
+_lag_task = None
+
+
+@app.on_event("startup")
+async def start_lag_monitor():
+    global _lag_task
+    if STATS_DIR:
+        path = Path(STATS_DIR) / f"loop-lag-{os.getpid()}.json"
+        _lag_task = asyncio.create_task(monitor_loop_lag(path))
+
+
+@app.on_event("shutdown")
+async def stop_lag_monitor():
+    if _lag_task is not None:
+        _lag_task.cancel()
@@ -0,0 +1,199 @@
+# بدائل محلية للنموذج اللغوي وقاعدة البيانات
+# In-memory storage and a fake LLM for benchmarks
+#
+# MemoryDatabase answers the Mongo-style calls server.py makes (see
+# storage.py) from a Python list. FakeLlm stands in for the upstream chat
+# model with a configurable latency distribution. install() wires both into
+# an imported server module, so benchmarks exercise the real endpoints,
+# history writer and explanation queue without any outside service.
+
+import asyncio
+import bisect
+import heapq
+import itertools
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Union
+
+from storage import naive_utc
+
+_OPERATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+    "$ne": lambda a, b: a != b,
+    "$in": lambda a, b: a in b,
+}
+
+# Documents are kept in this order, like the (timestamp, id) index in storage.py
+_INDEX_FIELDS = ("timestamp", "id")
+
+
+def _index_key(document: dict) -> tuple:
+    return document.get("timestamp"), document.get("id")
+
+
+def _operand(value):
+    # Stored timestamps are naive UTC, as in storage.py
+    return naive_utc(value) if isinstance(value, datetime) else value
+
+
+def _matches(document: dict, filter: dict) -> bool:
+    for field, condition in filter.items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            if value is None or not all(_OPERATORS[op](value, _operand(operand)) for op, operand in condition.items()):
+                return False
+        elif document.get(field) != _operand(condition):
+            return False
+    return True
+
+
+class MemoryCursor:
+    def __init__(self, documents: List[dict], filter: Optional[dict], projection: Optional[dict]):
+        self._documents = documents
+        self._filter = filter or {}
+        self._exclude = {field for field, keep in (projection or {}).items() if not keep}
+        self._sort: List[tuple] = []
+        self._limit: Optional[int] = None
+
+    def sort(self, key: Union[str, list], direction: int = 1) -> "MemoryCursor":
+        self._sort = [(key, direction)] if isinstance(key, str) else list(key)
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int) -> "MemoryCursor":
+        return self
+
+    def _results(self, length: Optional[int]) -> List[dict]:
+        limit = min((x for x in (self._limit, length) if x is not None), default=None)
+        fields = tuple(field for field, _ in self._sort)
+        if fields and fields == _INDEX_FIELDS[:len(fields)] and len({d for _, d in self._sort}) == 1:
+            # Walk the index and stop at the limit
+            ordered = reversed(self._documents) if self._sort[0][1] < 0 else iter(self._documents)
+            found = list(itertools.islice(
+                (document for document in ordered if _matches(document, self._filter)), limit
+            ))
+            return self._project(found)
+
+        found = [document for document in self._documents if _matches(document, self._filter)]
+        limit = len(found) if limit is None else min(limit, len(found))
+        if self._sort:
+            # Only sorts with one direction for every field, as server.py uses
+            fields = [field for field, _ in self._sort]
+            key = lambda document: tuple(document.get(field) for field in fields)  # noqa: E731
+            pick = heapq.nlargest if self._sort[0][1] < 0 else heapq.nsmallest
+            found = pick(limit, found, key=key)
+        return self._project(found[:limit])
+
+    def _project(self, documents: List[dict]) -> List[dict]:
+        return [
+            {field: value for field, value in document.items() if field not in self._exclude}
+            for document in documents
+        ]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return self._results(length)
+
+    async def _iterate(self) -> AsyncIterator[dict]:
+        for document in self._results(None):
+            yield document
+
+    def __aiter__(self) -> AsyncIterator[dict]:
+        return self._iterate()
+
+
+class MemoryCollection:
+    def __init__(self):
+        self.documents: List[dict] = []
+        self._indexes = {}
+
+    def _insert(self, document: dict):
+        # New records are the newest, so this is normally an append
+        bisect.insort(self.documents, dict(document), key=_index_key)
+
+    async def insert_one(self, document: dict):
+        self._insert(document)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True):
+        for document in documents:
+            self._insert(document)
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None) -> MemoryCursor:
+        return MemoryCursor(self.documents, filter, projection)
+
+    async def count_documents(self, filter: Optional[dict] = None) -> int:
+        return sum(1 for document in self.documents if _matches(document, filter or {}))
+
+    async def create_index(self, keys, name: str):
+        self._indexes[name] = keys
+
+    async def index_information(self) -> dict:
+        return dict(self._indexes)
+
+
+class MemoryDatabase:
+    name = "memory"
+
+    def __init__(self):
+        self.predictions = MemoryCollection()
+
+    def seed(self, count: int, now: Optional[datetime] = None):
+        """Add `count` history records spread over the last days"""
+        now = now or datetime.utcnow()
+        types = ("gender", "genetic", "traits")
+        for index in range(count):
+            self.predictions._insert({
+                "id": str(uuid.UUID(int=index)),
+                "type": types[index % len(types)],
+                "data": {"language": "ar" if index % 2 else "en"},
+                "result": {"predicted_gender": "male" if index % 3 == 0 else None, "explanation": "seed"},
+                "timestamp": now - timedelta(minutes=index),
+            })
+
+
+class FakeLlm:
+    """
+    Upstream model stand-in: answers after a lognormal delay.
+
+    median_ms is the typical latency and sigma the spread (0 = constant);
+    error_rate is the share of calls that fail.
+    """
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.5, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def delay(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self._random.lognormvariate(0.0, self.sigma) * self.median_ms / 1000
+
+    async def send(self, prompt: str, language: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay())
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise RuntimeError("fake LLM error")
+        return f"[fake explanation, {language}] {prompt[:40]}"
+
+
+def install(server, llm: Optional[FakeLlm] = None, db: Optional[MemoryDatabase] = None):
+    """Point an imported server module at the fake LLM and in-memory storage"""
+    llm = llm or FakeLlm()
+    db = db or MemoryDatabase()
+    server.AI_AVAILABLE = True
+    server.EMERGENT_LLM_KEY = server.EMERGENT_LLM_KEY or "fake"
+    server.send_llm_message = llm.send
+    server.db = db
+    return llm, db
@@ -0,0 +1,102 @@
+# تصدير البيانات بشكل متدفق
+# Streaming export of prediction history (JSON, NDJSON, CSV, optional gzip)
+#
+# Records are read from the storage cursor in batches and encoded as they
+# arrive, so memory stays flat however large the collection grows.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+CSV_COLUMNS = ("id", "type", "timestamp", "data", "result")
+
+# Flush encoded output to the client roughly every 64 KiB
+_CHUNK_SIZE = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+async def _encode_json(records: AsyncIterator[dict], meta: dict) -> AsyncIterator[str]:
+    # Same object as the original export; total_records goes last because it
+    # is only known once every record has been streamed
+    header = dumps(meta)[:-1]
+    yield header + (", " if meta else "") + '"data": ['
+    total = 0
+    async for record in records:
+        yield ("" if total == 0 else ", ") + dumps(record)
+        total += 1
+    yield f'], "total_records": {total}}}'
+
+
+async def _encode_ndjson(records: AsyncIterator[dict], meta: dict) -> AsyncIterator[str]:
+    async for record in records:
+        yield dumps(record) + "\n"
+
+
+def _csv_value(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Nested data/result stay as JSON inside the cell
+    return dumps(value)
+
+
+async def _encode_csv(records: AsyncIterator[dict], meta: dict) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async for record in records:
+        writer.writerow([_csv_value(record.get(column, "")) for column in CSV_COLUMNS])
+        if buffer.tell() >= _CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+_ENCODERS = {"json": _encode_json, "ndjson": _encode_ndjson, "csv": _encode_csv}
+
+
+async def export_stream(
+    records: AsyncIterator[dict],
+    format: str = "json",
+    compress: bool = False,
+    meta: Optional[dict] = None,
+) -> AsyncIterator[bytes]:
+    """Encode records as they are read and yield byte chunks (gzip if compress)"""
+    gzip = zlib.compressobj(wbits=31) if compress else None
+    pending = []
+    size = 0
+    async for text in _ENCODERS[format](records, meta or {}):
+        pending.append(text)
+        size += len(text)
+        if size < _CHUNK_SIZE:
+            continue
+        data = "".join(pending).encode("utf-8")
+        pending, size = [], 0
+        if gzip is not None:
+            data = gzip.compress(data)
+        if data:
+            yield data
+    data = "".join(pending).encode("utf-8")
+    if gzip is not None:
+        data = gzip.compress(data) + gzip.flush()
+    if data:
+        yield data
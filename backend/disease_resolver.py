@@ -0,0 +1,125 @@
+# التعرف على أسماء الأمراض المكتوبة بحرية
+# Fuzzy disease-name resolver for free-text family history
+#
+# Every canonical name and alias (Arabic and English) is split into padded
+# character trigrams and stored in an inverted index. A query only touches
+# the postings of its own trigrams, so lookups stay well under a millisecond
+# even with thousands of catalog entries, and tolerate misspellings.
+#
+# Generic words ("deficiency", "anemia", "فقر الدم") are left out of the
+# trigrams on both sides: they name whole families of conditions, and scoring
+# them let "iron deficiency" resolve to G6PD deficiency. An alias made only
+# of generic words ("muscular dystrophy") is matched exactly or not at all.
+
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_LETTERS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ة": "ه", "ى": "ي", "ؤ": "و", "ئ": "ي"})
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Share of an alias's trigrams that longer text must contain to count as
+# mentioning it; lower values let a fragment of a name match
+MIN_COVERAGE = 0.85
+
+# Words that say what kind of condition something is, not which one
+GENERIC_WORDS = (
+    "anemia", "anaemia", "blood", "deficiency", "deficient", "disease", "disorder", "dystrophy",
+    "genetic", "hereditary", "inherited", "muscle", "muscular", "syndrome",
+    "أنيميا", "الأنيميا", "فقر", "دم", "الدم", "نقص", "إنزيم", "الإنزيم", "ضمور", "الضمور",
+    "عضلات", "العضلات", "عضلي", "العضلي", "مرض", "متلازمة", "وراثي", "الوراثي",
+)
+
+
+def normalize_disease_name(text: str) -> str:
+    """Lowercase, drop Arabic diacritics, unify letter variants and punctuation"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _ARABIC_DIACRITICS.sub("", text).translate(_ARABIC_LETTERS)
+    return " ".join(_NON_WORD.sub(" ", text).replace("_", " ").split())
+
+
+_GENERIC_WORDS = frozenset(normalize_disease_name(word) for word in GENERIC_WORDS)
+
+
+def distinctive_words(text: str) -> str:
+    """A normalized name without its generic words"""
+    return " ".join(word for word in text.split() if word not in _GENERIC_WORDS)
+
+
+def trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class DiseaseResolver:
+    """Ranked canonical conditions for a free-text disease name"""
+
+    def __init__(self, catalog: Dict[str, dict], min_score: float = 0.6, min_margin: float = 0.05):
+        self.min_score = min_score
+        # match() ignores names whose two best diseases score within this margin
+        self.min_margin = min_margin
+        # alias id -> (disease key, distinctive words of the alias, number of distinct trigrams)
+        self._aliases: List[Tuple[str, str, int]] = []
+        self._exact: Dict[str, str] = {}
+        self._postings: Dict[str, List[int]] = {}
+        for key, disease in catalog.items():
+            names = [disease["en"], disease["ar"], *disease.get("aliases", ())]
+            for name in names:
+                alias = normalize_disease_name(name)
+                if not alias or alias in self._exact:
+                    continue
+                self._exact[alias] = key
+                core = distinctive_words(alias)
+                if not core:
+                    continue
+                grams = set(trigrams(core))
+                alias_id = len(self._aliases)
+                self._aliases.append((key, core, len(grams)))
+                for gram in grams:
+                    self._postings.setdefault(gram, []).append(alias_id)
+
+    def resolve(self, text: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """Return up to `limit` (disease key, score) pairs, best first"""
+        query = normalize_disease_name(text)
+        if not query:
+            return []
+        key = self._exact.get(query)
+        if key is not None:
+            return [(key, 1.0)]
+        core = distinctive_words(query)
+        if not core:
+            return []
+
+        grams = set(trigrams(core))
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for alias_id in self._postings.get(gram, ()):
+                shared[alias_id] = shared.get(alias_id, 0) + 1
+
+        best: Dict[str, float] = {}
+        for alias_id, count in shared.items():
+            disease_key, _, alias_size = self._aliases[alias_id]
+            # Dice similarity for misspellings; near-complete coverage of the
+            # alias for longer text that mentions it ("father had sickle cell")
+            score = 2 * count / (len(grams) + alias_size)
+            coverage = count / alias_size
+            if coverage >= MIN_COVERAGE:
+                score = max(score, coverage * 0.95)
+            if score >= self.min_score and score > best.get(disease_key, 0.0):
+                best[disease_key] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return [(disease_key, round(score, 3)) for disease_key, score in ranked[:limit]]
+
+    def match(self, names) -> set:
+        """Catalog keys for the best unambiguous resolution of each name"""
+        found = set()
+        for name in names:
+            resolved = self.resolve(name, limit=2)
+            if not resolved:
+                continue
+            if len(resolved) > 1 and resolved[0][1] - resolved[1][1] < self.min_margin:
+                # Ambiguous (e.g. a bare "anemia"): don't guess
+                continue
+            found.add(resolved[0][0])
+        return found
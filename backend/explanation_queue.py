@@ -0,0 +1,111 @@
+# طابور توليد الشروحات في الخلفية
+# Background queue for AI explanation generation
+#
+# Explanations are stored for the owner only and never returned to the user,
+# so endpoints hand them to this queue and respond straight away.
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExplanationJob:
+    prompt: str
+    language: str
+    # Called with the generated text, or None if every attempt failed
+    on_result: Callable[[Optional[str]], Awaitable[None]]
+
+
+class ExplanationQueue:
+    """Bounded in-process work queue with a worker pool and retries"""
+
+    def __init__(
+        self,
+        generate: Callable[[str, str], Awaitable[str]],
+        max_size: int = 1000,
+        workers: int = 4,
+        max_retries: int = 2,
+        retry_delay: float = 0.5,
+    ):
+        self.generate = generate
+        self.max_size = max_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Start the worker pool (call from the running event loop)"""
+        if self._accepting:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._accepting = True
+
+    def submit(self, prompt: str, language: str, on_result: Callable[[Optional[str]], Awaitable[None]]) -> bool:
+        """Queue a job without waiting. Returns False if stopped or full."""
+        if not self._accepting:
+            return False
+        try:
+            self._queue.put_nowait(ExplanationJob(prompt, language, on_result))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Explanation queue full, dropping job")
+            return False
+        return True
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop accepting jobs, drain what is queued, then stop the workers"""
+        if self._queue is None:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Explanation queue drain timed out with {self._queue.qsize()} jobs left")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                text = await self._generate_with_retries(job)
+                await job.on_result(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Explanation worker {worker_id} error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _generate_with_retries(self, job: ExplanationJob) -> Optional[str]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.generate(job.prompt, job.language)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Explanation attempt {attempt + 1} failed: {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))
+        self.failed += 1
+        return None
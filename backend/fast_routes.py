@@ -0,0 +1,72 @@
+# مسار سريع لنقاط التوقع الأكثر استخداماً
+# Fast path for the hot prediction endpoints
+#
+# For a plain JSON request the body is validated straight from bytes by the
+# request model's compiled (pydantic-core) schema, the endpoint is called
+# directly, and the response model is serialized with orjson. Anything else -
+# another content type, invalid JSON, a validation error - is handed to the
+# regular FastAPI handler, so accepted inputs, error responses and response
+# bytes are the same as without the fast path.
+
+import asyncio
+import json
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content)
+except ImportError:
+    orjson = None
+
+    def dumps(content: Any) -> bytes:
+        # Same output as FastAPI's JSONResponse
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _is_plain_json(request: Request) -> bool:
+    content_type = request.headers.get("content-type")
+    return content_type is None or content_type.split(";", 1)[0].strip().lower() == "application/json"
+
+
+class FastJSONRoute(APIRoute):
+    """APIRoute with a fast path for endpoints taking a single JSON body model"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        dependant = self.dependant
+        simple = (
+            len(dependant.body_params) == 1
+            and not (dependant.path_params or dependant.query_params or dependant.header_params
+                     or dependant.cookie_params or dependant.dependencies)
+            and asyncio.iscoroutinefunction(self.endpoint)
+        )
+        if not simple:
+            return handler
+        body_param = dependant.body_params[0]
+        model = body_param.type_
+        if not (isinstance(model, type) and issubclass(model, BaseModel)):
+            return handler
+        endpoint = self.endpoint
+        name = body_param.name
+
+        async def fast_handler(request: Request) -> Response:
+            if not _is_plain_json(request):
+                return await handler(request)
+            body = await request.body()
+            try:
+                payload = model.model_validate_json(body)
+            except ValidationError:
+                # The regular handler builds the exact 422 response (body is cached)
+                return await handler(request)
+            result = await endpoint(**{name: payload})
+            if isinstance(result, Response):
+                return result
+            return Response(dumps(result.model_dump(mode="json")), media_type="application/json")
+
+        return fast_handler
@@ -1,198 +1,303 @@
 # نظام توقع نوع الجنين بناءً على التاريخ العائلي
 # Gender Prediction System Based on Family History
+#
+# The rules live in a versioned JSON file (gender_rules.json). Each file is
+# validated and compiled into a PredictionRules object; swap_rules() replaces
+# the active one with a single assignment, so a request always sees one
+# complete rule set and the file can be reloaded while serving.
 
+import hashlib
+import itertools
+import json
 import random
+import sys
+from pathlib import Path
 
-# جدول التوقعات - 36 حالة
-# Prediction Table - 36 Cases
-PREDICTION_TABLE = {
-    # التوقع 1-6: عائلة الزوجة (ذكر، ذكر، أنثى)
-    ("ذكر", "ذكر", "أنثى", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "ذكر"},  # 1
-    ("ذكر", "ذكر", "أنثى", "ذكر", "أنثى", "أنثى"): {"first": "ذكر", "second": "ذكر"},  # 2
-    ("ذكر", "ذكر", "أنثى", "أنثى", "ذكر", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 3
-    ("ذكر", "ذكر", "أنثى", "أنثى", "ذكر", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 4
-    ("ذكر", "ذكر", "أنثى", "أنثى", "أنثى", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 5
-    ("ذكر", "ذكر", "أنثى", "ذكر", "أنثى", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 6
-    
-    # التوقع 7-12: عائلة الزوجة (ذكر، أنثى، أنثى)
-    ("ذكر", "أنثى", "أنثى", "ذكر", "أنثى", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 7
-    ("ذكر", "أنثى", "أنثى", "أنثى", "ذكر", "أنثى"): {"first": "أنثى", "second": "ذكر"},  # 8
-    ("ذكر", "أنثى", "أنثى", "أنثى", "ذكر", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 9
-    ("ذكر", "أنثى", "أنثى", "أنثى", "أنثى", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 10
-    ("ذكر", "أنثى", "أنثى", "ذكر", "أنثى", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 11
-    ("ذكر", "أنثى", "أنثى", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "ذكر"},  # 12
-    
-    # التوقع 13-18: عائلة الزوجة (أنثى، ذكر، أنثى)
-    ("أنثى", "ذكر", "أنثى", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 13
-    ("أنثى", "ذكر", "أنثى", "ذكر", "أنثى", "أنثى"): {"first": "أنثى", "second": "ذكر"},  # 14
-    ("أنثى", "ذكر", "أنثى", "أنثى", "ذكر", "أنثى"): {"first": "أنثى", "second": "ذكر"},  # 15
-    ("أنثى", "ذكر", "أنثى", "أنثى", "ذكر", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 16
-    ("أنثى", "ذكر", "أنثى", "أنثى", "أنثى", "ذكر"): {"first": "أنثى", "second": "أنثى"},  # 17
-    ("أنثى", "ذكر", "أنثى", "ذكر", "أنثى", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 18
-    
-    # التوقع 19-24: عائلة الزوجة (أنثى، ذكر، ذكر)
-    ("أنثى", "ذكر", "ذكر", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 19
-    ("أنثى", "ذكر", "ذكر", "ذكر", "أنثى", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 20
-    ("أنثى", "ذكر", "ذكر", "أنثى", "ذكر", "أنثى"): {"first": "أنثى", "second": "ذكر"},  # 21
-    ("أنثى", "ذكر", "ذكر", "أنثى", "ذكر", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 22
-    ("أنثى", "ذكر", "ذكر", "أنثى", "أنثى", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 23
-    ("أنثى", "ذكر", "ذكر", "ذكر", "أنثى", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 24
-    
-    # التوقع 25-30: عائلة الزوجة (أنثى، أنثى، ذكر)
-    ("أنثى", "أنثى", "ذكر", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 25
-    ("أنثى", "أنثى", "ذكر", "ذكر", "أنثى", "أنثى"): {"first": "أنثى", "second": "ذكر"},  # 26
-    ("أنثى", "أنثى", "ذكر", "أنثى", "ذكر", "أنثى"): {"first": "أنثى", "second": "ذكر"},  # 27
-    ("أنثى", "أنثى", "ذكر", "أنثى", "ذكر", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 28
-    ("أنثى", "أنثى", "ذكر", "أنثى", "أنثى", "ذكر"): {"first": "أنثى", "second": "أنثى"},  # 29
-    ("أنثى", "أنثى", "ذكر", "ذكر", "أنثى", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 30
-    
-    # التوقع 31-36: عائلة الزوجة (ذكر، أنثى، ذكر)
-    ("ذكر", "أنثى", "ذكر", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "ذكر"},  # 31
-    ("ذكر", "أنثى", "ذكر", "ذكر", "أنثى", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 32
-    ("ذكر", "أنثى", "ذكر", "أنثى", "ذكر", "أنثى"): {"first": "ذكر", "second": "أنثى"},  # 33
-    ("ذكر", "أنثى", "ذكر", "أنثى", "ذكر", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 34
-    ("ذكر", "أنثى", "ذكر", "أنثى", "أنثى", "ذكر"): {"first": "أنثى", "second": "ذكر"},  # 35
-    ("ذكر", "أنثى", "ذكر", "ذكر", "أنثى", "ذكر"): {"first": "ذكر", "second": "أنثى"},  # 36
-    
-    # التوقعات 37-40: حالة طفل واحد من كل عائلة
-    ("ذكر", "أنثى"): {"first": "أنثى", "second": "أنثى"},  # 37
-    ("أنثى", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 38
-    ("أنثى", "أنثى"): {"first": "أنثى", "second": "أنثى"},  # 39
-    ("ذكر", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 40
-    
-    # التوقعات 41-52: حالة طفلين من كل عائلة
-    ("ذكر", "ذكر", "ذكر", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 41
-    ("ذكر", "أنثى", "ذكر", "أنثى"): {"first": "ذكر", "second": "ذكر"},  # 42
-    ("أنثى", "أنثى", "أنثى", "أنثى"): {"first": "أنثى", "second": "أنثى"},  # 43
-    ("أنثى", "ذكر", "أنثى", "ذكر"): {"first": "أنثى", "second": "أنثى"},  # 44
-    ("أنثى", "أنثى", "ذكر", "أنثى"): {"first": "أنثى", "second": "أنثى"},  # 45
-    ("ذكر", "ذكر", "أنثى", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 46
-    ("ذكر", "أنثى", "ذكر", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 47
-    ("أنثى", "ذكر", "ذكر", "ذكر"): {"first": "ذكر", "second": "ذكر"},  # 48
-    ("ذكر", "أنثى", "أنثى", "أنثى"): {"first": "أنثى", "second": "أنثى"},  # 49
-    ("أنثى", "ذكر", "أنثى", "أنثى"): {"first": "أنثى", "second": "أنثى"},  # 50
-    ("ذكر", "ذكر", "ذكر", "أنثى"): {"first": "ذكر", "second": "ذكر"},  # 51
-    ("أنثى", "أنثى", "أنثى", "ذكر"): {"first": "أنثى", "second": "أنثى"},  # 52
-}
+import numpy as np
 
-# English version of the table
-PREDICTION_TABLE_EN = {
-    # Convert Arabic to English for lookups
-    ("male", "male", "female", "male", "male", "female"): {"first": "male", "second": "male"},
-    ("male", "male", "female", "male", "female", "female"): {"first": "male", "second": "male"},
-    ("male", "male", "female", "female", "male", "female"): {"first": "male", "second": "female"},
-    ("male", "male", "female", "female", "male", "male"): {"first": "male", "second": "female"},
-    ("male", "male", "female", "female", "female", "male"): {"first": "male", "second": "female"},
-    ("male", "male", "female", "male", "female", "male"): {"first": "male", "second": "female"},
-    
-    ("male", "female", "female", "male", "female", "female"): {"first": "male", "second": "female"},
-    ("male", "female", "female", "female", "male", "female"): {"first": "female", "second": "male"},
-    ("male", "female", "female", "female", "male", "male"): {"first": "male", "second": "female"},
-    ("male", "female", "female", "female", "female", "male"): {"first": "female", "second": "male"},
-    ("male", "female", "female", "male", "female", "male"): {"first": "male", "second": "female"},
-    ("male", "female", "female", "male", "male", "female"): {"first": "male", "second": "male"},
-    
-    ("female", "male", "female", "male", "male", "female"): {"first": "male", "second": "female"},
-    ("female", "male", "female", "male", "female", "female"): {"first": "female", "second": "male"},
-    ("female", "male", "female", "female", "male", "female"): {"first": "female", "second": "male"},
-    ("female", "male", "female", "female", "male", "male"): {"first": "female", "second": "male"},
-    ("female", "male", "female", "female", "female", "male"): {"first": "female", "second": "female"},
-    ("female", "male", "female", "male", "female", "male"): {"first": "male", "second": "female"},
-    
-    ("female", "male", "male", "male", "male", "female"): {"first": "male", "second": "female"},
-    ("female", "male", "male", "male", "female", "female"): {"first": "male", "second": "female"},
-    ("female", "male", "male", "female", "male", "female"): {"first": "female", "second": "male"},
-    ("female", "male", "male", "female", "male", "male"): {"first": "female", "second": "male"},
-    ("female", "male", "male", "female", "female", "male"): {"first": "female", "second": "male"},
-    ("female", "male", "male", "male", "female", "male"): {"first": "male", "second": "female"},
-    
-    ("female", "female", "male", "male", "male", "female"): {"first": "male", "second": "female"},
-    ("female", "female", "male", "male", "female", "female"): {"first": "female", "second": "male"},
-    ("female", "female", "male", "female", "male", "female"): {"first": "female", "second": "male"},
-    ("female", "female", "male", "female", "male", "male"): {"first": "female", "second": "male"},
-    ("female", "female", "male", "female", "female", "male"): {"first": "female", "second": "female"},
-    ("female", "female", "male", "male", "female", "male"): {"first": "female", "second": "male"},
-    
-    ("male", "female", "male", "male", "male", "female"): {"first": "male", "second": "male"},
-    ("male", "female", "male", "male", "female", "female"): {"first": "male", "second": "female"},
-    ("male", "female", "male", "female", "male", "female"): {"first": "male", "second": "female"},
-    ("male", "female", "male", "female", "male", "male"): {"first": "male", "second": "male"},
-    ("male", "female", "male", "female", "female", "male"): {"first": "female", "second": "male"},
-    ("male", "female", "male", "male", "female", "male"): {"first": "male", "second": "female"},
-    
-    # Cases 37-40: One child from each family
-    ("male", "female"): {"first": "female", "second": "female"},  # 37
-    ("female", "male"): {"first": "male", "second": "male"},  # 38
-    ("female", "female"): {"first": "female", "second": "female"},  # 39
-    ("male", "male"): {"first": "male", "second": "male"},  # 40
-    
-    # Cases 41-52: Two children from each family
-    ("male", "male", "male", "male"): {"first": "male", "second": "male"},  # 41
-    ("male", "female", "male", "female"): {"first": "male", "second": "male"},  # 42
-    ("female", "female", "female", "female"): {"first": "female", "second": "female"},  # 43
-    ("female", "male", "female", "male"): {"first": "female", "second": "female"},  # 44
-    ("female", "female", "male", "female"): {"first": "female", "second": "female"},  # 45
-    ("male", "male", "female", "male"): {"first": "male", "second": "male"},  # 46
-    ("male", "female", "male", "male"): {"first": "male", "second": "male"},  # 47
-    ("female", "male", "male", "male"): {"first": "male", "second": "male"},  # 48
-    ("male", "female", "female", "female"): {"first": "female", "second": "female"},  # 49
-    ("female", "male", "female", "female"): {"first": "female", "second": "female"},  # 50
-    ("male", "male", "male", "female"): {"first": "male", "second": "male"},  # 51
-    ("female", "female", "female", "male"): {"first": "female", "second": "female"},  # 52
+# تحويل الجنس إلى الإنجليزية
+# Gender normalization map (Arabic / English aliases -> English)
+GENDER_AR_TO_EN = {
+    "ذكر": "male", "male": "male", "boy": "male", "m": "male",
+    "أنثى": "female", "female": "female", "girl": "female", "f": "female",
 }
 
+# الجدول المُجمَّع - فهرس رقمي مباشر
+# Compiled table - dense integer index
+#
+# A pattern (wife family followed by husband family) is encoded as a bitmask
+# with a leading sentinel bit that carries its length: male = 1, female = 0,
+# so ("male", "female") -> 0b110. Patterns hold at most 6 children, so every
+# code fits in 7 bits and the whole table is a 128-byte array. Each entry is
+# 0 when the pattern is unknown, otherwise 0b1<first><second>.
+MAX_PATTERN_LENGTH = 6
+_GENDER_BITS = {"male": 1, "female": 0}
+_GENDER_BY_BIT = ("female", "male")
+_FOUND = 0b100
+
+
+def _compile_prediction_table(table):
+    """Build the dense lookup array from an English prediction table"""
+    index = bytearray(1 << (MAX_PATTERN_LENGTH + 1))
+    for pattern, prediction in table.items():
+        code = 1
+        for gender in pattern:
+            code = (code << 1) | _GENDER_BITS[gender]
+        index[code] = (
+            _FOUND
+            | _GENDER_BITS[prediction["first"]] << 1
+            | _GENDER_BITS[prediction["second"]]
+        )
+    return bytes(index)
+
+
+def _gender_bit(gender):
+    """Return 1 for male, 0 for female, None for unknown values"""
+    normalized = GENDER_AR_TO_EN.get(gender)
+    if normalized is None:
+        normalized = gender.lower()
+    return _GENDER_BITS.get(normalized)
+
+
+def is_known_gender(gender):
+    """True for "male"/"female" in any accepted spelling (Arabic or English)"""
+    return isinstance(gender, str) and _gender_bit(gender) is not None
+
+
+def encode_pattern(wife_family, husband_family):
+    """Encode both families as one table index, or None if it cannot match"""
+    if len(wife_family) + len(husband_family) > MAX_PATTERN_LENGTH:
+        return None
+    code = 1
+    for gender in wife_family:
+        bit = _gender_bit(gender)
+        if bit is None:
+            return None
+        code = (code << 1) | bit
+    for gender in husband_family:
+        bit = _gender_bit(gender)
+        if bit is None:
+            return None
+        code = (code << 1) | bit
+    return code
+
+
+# شجرة البادئات - للعائلات مختلفة الحجم
+# Prefix trie over child pairs
+#
+# The table only covers families of equal size (1, 2 or 3 children each). The
+# trie walks both families together, one (wife child, husband child) pair per
+# level, and keeps the deepest rule seen, so families of any size - or an
+# equal-size pattern the table lacks - fall back to the longest matching
+# prefix in O(pattern length).
+class _TrieNode:
+    __slots__ = ("prediction", "children")
+
+    def __init__(self):
+        self.prediction = None
+        # Indexed by (wife bit << 1) | husband bit
+        self.children = [None, None, None, None]
+
+
+class PatternTrie:
+    def __init__(self, table=None):
+        self.root = _TrieNode()
+        for pattern, prediction in (table or {}).items():
+            half = len(pattern) // 2
+            self.insert(pattern[:half], pattern[half:], (prediction["first"], prediction["second"]))
+
+    def insert(self, wife_family, husband_family, prediction):
+        if len(wife_family) != len(husband_family):
+            raise ValueError("Trie patterns need the same number of children in both families")
+        node = self.root
+        for wife_gender, husband_gender in zip(wife_family, husband_family):
+            index = (_GENDER_BITS[wife_gender] << 1) | _GENDER_BITS[husband_gender]
+            if node.children[index] is None:
+                node.children[index] = _TrieNode()
+            node = node.children[index]
+        node.prediction = prediction
+
+    def longest_prefix(self, wife_family, husband_family):
+        """(prediction, children matched per family) for the deepest rule, or None"""
+        node = self.root
+        best = None
+        depth = 0
+        for wife_gender, husband_gender in zip(wife_family, husband_family):
+            wife_bit = _gender_bit(wife_gender)
+            husband_bit = _gender_bit(husband_gender)
+            if wife_bit is None or husband_bit is None:
+                break
+            node = node.children[(wife_bit << 1) | husband_bit]
+            if node is None:
+                break
+            depth += 1
+            if node.prediction is not None:
+                best = (node.prediction, depth)
+        return best
+
+
+# ملف القواعد
+# Rule file
+#   {"version": "...", "rules": [{"id": 1, "wife": [...], "husband": [...],
+#                                 "first": "...", "second": "..."}, ...]}
+# Genders may be written in Arabic or English; both families list the same
+# number of children (1 to 3).
+DEFAULT_RULES_PATH = Path(__file__).parent / "gender_rules.json"
+
+
+class PredictionRules:
+    """One validated rule file, compiled for lookups (never modified after loading)"""
+
+    def __init__(self, version, table, source=None):
+        self.version = version
+        # English pattern (wife children + husband children) -> {"first", "second"}
+        self.table = table
+        self.source = source
+        self.compiled = _compile_prediction_table(table)
+        self.compiled_array = np.frombuffer(self.compiled, dtype=np.uint8)
+        self.trie = PatternTrie(table)
+
+
+def parse_rules(data, source=None):
+    """Validate a decoded rule file and compile it; raises ValueError"""
+    if not isinstance(data, dict) or not isinstance(data.get("version"), (str, int)):
+        raise ValueError("Rule file needs a version")
+    rules = data.get("rules")
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("Rule file needs a non-empty rules list")
+
+    table = {}
+    for position, rule in enumerate(rules, 1):
+        label = f"Rule {rule.get('id', position) if isinstance(rule, dict) else position}"
+        if not isinstance(rule, dict):
+            raise ValueError(f"{label}: must be an object")
+        wife, husband = rule.get("wife"), rule.get("husband")
+        if (not isinstance(wife, list) or not isinstance(husband, list) or not wife
+                or len(wife) != len(husband) or len(wife) + len(husband) > MAX_PATTERN_LENGTH):
+            raise ValueError(f"{label}: wife and husband need the same number of children (1 to {MAX_PATTERN_LENGTH // 2})")
+        try:
+            pattern = tuple(GENDER_AR_TO_EN[gender] for gender in wife + husband)
+            prediction = {order: GENDER_AR_TO_EN[rule[order]] for order in ("first", "second")}
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{label}: unknown or missing gender {e}")
+        if pattern in table:
+            raise ValueError(f"{label}: duplicate pattern")
+        table[pattern] = prediction
+    return PredictionRules(str(data["version"]), table, source)
+
+
+def load_rules(path):
+    """Read, validate and compile a rule file"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return parse_rules(data, str(path))
+
+
+_active_rules = load_rules(DEFAULT_RULES_PATH)
+
+
+def active_rules():
+    return _active_rules
+
+
+def swap_rules(rules):
+    """Make `rules` active for every following lookup; returns the previous set"""
+    global _active_rules
+    previous, _active_rules = _active_rules, rules
+    return previous
+
+
+def lookup_prediction(wife_family, husband_family):
+    """Return (first, second) predicted genders, or None if no rule matches"""
+    rules = _active_rules
+    if len(wife_family) == len(husband_family):
+        # Exact rule: one index into the compiled table
+        code = encode_pattern(wife_family, husband_family)
+        if code is not None and rules.compiled[code]:
+            entry = rules.compiled[code]
+            return _GENDER_BY_BIT[(entry >> 1) & 1], _GENDER_BY_BIT[entry & 1]
+    match = rules.trie.longest_prefix(wife_family, husband_family)
+    return match[0] if match else None
+
 
 def normalize_gender_ar_to_en(gender_ar):
     """تحويل الجنس من العربية للإنجليزية"""
-    if gender_ar in ["ذكر", "male", "boy", "m"]:
-        return "male"
-    elif gender_ar in ["أنثى", "female", "girl", "f"]:
-        return "female"
-    return gender_ar.lower()
+    normalized = GENDER_AR_TO_EN.get(gender_ar)
+    if normalized is None:
+        return gender_ar.lower()
+    return normalized
+
+
+def prediction_key(wife_family, husband_family, child_number):
+    """Normalized (wife, husband, child number) - equal keys get equal predictions"""
+    return (
+        tuple(normalize_gender_ar_to_en(gender) for gender in wife_family),
+        tuple(normalize_gender_ar_to_en(gender) for gender in husband_family),
+        child_number,
+    )
+
+
+class StableRandom:
+    """
+    randint/choice drawn from a hash of a prediction key instead of global state.
+
+    Each draw hashes the key with its own salt, so the same key always gives
+    the same values in every process and across restarts.
+    """
+
+    def __init__(self, key):
+        wife_family, husband_family, child_number = key
+        self._seed = f"{','.join(wife_family)}|{','.join(husband_family)}|{child_number}".encode()
+
+    def _draw(self, salt, size):
+        digest = hashlib.blake2b(self._seed, digest_size=8, salt=salt).digest()
+        return int.from_bytes(digest, "big") % size
+
+    def randint(self, low, high):
+        return low + self._draw(b"confidence", high - low + 1)
 
+    def choice(self, values):
+        return values[self._draw(b"choice", len(values))]
 
-def predict_gender(wife_family, husband_family, child_number=1):
+
+def predict_gender(wife_family, husband_family, child_number=1, deterministic=False):
     """
     توقع نوع الجنين بناءً على التاريخ العائلي
     
     Args:
-        wife_family: list of 3 genders from wife's family [child1, child2, child3]
-        husband_family: list of 3 genders from husband's family [child1, child2, child3]
+        wife_family: genders from wife's family in child order [child1, child2, ...]
+        husband_family: genders from husband's family in child order [child1, child2, ...]
         child_number: 1 for first child, 2 for second child
+        deterministic: draw confidence (and the 3rd+ child guess) from a hash
+            of the normalized pattern, so equal inputs give equal results
         
     Returns:
         dict: {"gender": "male/female", "confidence": 70-90 for first, 50-60 for second}
     """
+    rng = StableRandom(prediction_key(wife_family, husband_family, child_number)) if deterministic else random
     
-    # Normalize inputs to English
-    wife_normalized = tuple([normalize_gender_ar_to_en(g) for g in wife_family])
-    husband_normalized = tuple([normalize_gender_ar_to_en(g) for g in husband_family])
-    
-    # Create lookup key
-    lookup_key = wife_normalized + husband_normalized
-    
-    # Get prediction
-    prediction = PREDICTION_TABLE_EN.get(lookup_key)
+    # Get prediction from the compiled table
+    prediction = lookup_prediction(wife_family, husband_family)
     
     if not prediction:
         # If pattern not found, return default
         return {
             "gender": "male",
-            "confidence": random.randint(50, 60),
+            "confidence": rng.randint(50, 60),
             "note": "Pattern not found in database, using default prediction"
         }
     
     # Get predicted gender for requested child
     if child_number == 1:
-        predicted_gender = prediction["first"]
-        confidence = random.randint(70, 90)  # 70-90% للطفل الأول
+        predicted_gender = prediction[0]
+        confidence = rng.randint(70, 90)  # 70-90% للطفل الأول
     elif child_number == 2:
-        predicted_gender = prediction["second"]
-        confidence = random.randint(50, 60)  # 50-60% للطفل الثاني
+        predicted_gender = prediction[1]
+        confidence = rng.randint(50, 60)  # 50-60% للطفل الثاني
     else:
         # For 3rd+ children, use lower confidence
-        predicted_gender = random.choice(["male", "female"])
-        confidence = random.randint(40, 50)
+        predicted_gender = rng.choice(["male", "female"])
+        confidence = rng.randint(40, 50)
     
     return {
         "gender": predicted_gender,
@@ -200,6 +305,156 @@ def predict_gender(wife_family, husband_family, child_number=1):
     }
 
 
+# التوقع الجماعي - مُتَّجَه بالكامل
+# Batch prediction - vectorized with NumPy over the compiled table
+_GENDER_NAMES = np.array(_GENDER_BY_BIT)
+_KNOWN_GENDER_BITS = {alias: _GENDER_BITS[gender] for alias, gender in GENDER_AR_TO_EN.items()}
+
+
+# Longest family with an exact int64 key (length sentinel bit plus one bit per child)
+_MAX_KEY_LENGTH = 62
+
+
+def _encode_families(families):
+    """Encode a list of families as (bits, lengths, valid, keys) arrays"""
+    lengths = np.fromiter((len(family) for family in families), dtype=np.int64, count=len(families))
+    flat = [gender for family in families for gender in family]
+    flat_bits = np.fromiter(
+        (_KNOWN_GENDER_BITS[g] if g in _KNOWN_GENDER_BITS else _unknown_gender_bit(g) for g in flat),
+        dtype=np.int64,
+        count=len(flat),
+    )
+    rows = np.repeat(np.arange(len(families)), lengths)
+    # Position of each child counted from the end of its family
+    ends = np.cumsum(lengths)
+    shifts = np.repeat(ends, lengths) - np.arange(len(flat)) - 1
+    valid_bits = np.where(flat_bits < 0, 0, flat_bits)
+    # Bits above position 6 are masked out below, so clamp the shift to keep
+    # the int64 values small for very large families
+    bits = np.bincount(rows, weights=valid_bits << np.minimum(shifts, MAX_PATTERN_LENGTH), minlength=len(families))
+    unknown = np.bincount(rows, weights=flat_bits < 0, minlength=len(families))
+    valid = unknown == 0
+    # Exact code of the whole family: per-family sums are differences of a
+    # running total, which wraps in uint64 but stays exact for each family
+    key_bits = valid_bits.astype(np.uint64) << np.minimum(shifts, _MAX_KEY_LENGTH).astype(np.uint64)
+    totals = np.zeros(len(flat) + 1, dtype=np.uint64)
+    np.cumsum(key_bits, out=totals[1:])
+    sentinels = np.uint64(1) << np.minimum(lengths, _MAX_KEY_LENGTH).astype(np.uint64)
+    codes = (totals[ends] - totals[ends - lengths]) | sentinels
+    keys = np.where(valid & (lengths <= _MAX_KEY_LENGTH), codes.view(np.int64), -1)
+    return bits.astype(np.int64), lengths, valid, keys
+
+
+def _distinct_rows(*columns):
+    """
+    (first row of each distinct tuple, distinct index of every row) over equal-length columns.
+
+    Each column is replaced by its dense rank and folded into the running id,
+    re-ranked after every step so the combined ids stay below rows**2.
+    """
+    ids = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        values, ranks = np.unique(column, return_inverse=True)
+        _, ids = np.unique(ids * len(values) + ranks.reshape(-1), return_inverse=True)
+    _, first_rows, inverse = np.unique(ids.reshape(-1), return_index=True, return_inverse=True)
+    return first_rows, inverse.reshape(-1)
+
+
+def _unknown_gender_bit(gender):
+    bit = _gender_bit(gender)
+    return -1 if bit is None else bit
+
+
+def predict_gender_batch(wife_families, husband_families, child_numbers, rng=None, deterministic=False):
+    """
+    توقع نوع الجنين لمجموعة من العائلات دفعة واحدة
+
+    Vectorized equivalent of calling predict_gender once per row; only rows
+    without an exact rule take the (per-row) trie fallback.
+
+    Args:
+        wife_families: list of gender lists, one per row
+        husband_families: list of gender lists, one per row
+        child_numbers: pregnancy order for each row
+        rng: optional numpy Generator used for confidences and 3rd+ children
+        deterministic: draw each row's confidence (and 3rd+ child guess) from
+            StableRandom, giving the same values as predict_gender(deterministic=True)
+
+    Returns:
+        dict: {"gender": array of "male"/"female", "confidence": int array,
+               "found": bool array (False when the default prediction was used)}
+    """
+    if not len(wife_families) == len(husband_families) == len(child_numbers):
+        raise ValueError("wife_families, husband_families and child_numbers must have the same length")
+    if rng is None:
+        rng = np.random.default_rng()
+
+    count = len(child_numbers)
+    wife_bits, wife_lengths, wife_valid, wife_keys = _encode_families(wife_families)
+    husband_bits, husband_lengths, husband_valid, husband_keys = _encode_families(husband_families)
+
+    # Same index as encode_pattern: sentinel, wife bits, then husband bits
+    lengths = wife_lengths + husband_lengths
+    in_range = wife_valid & husband_valid & (wife_lengths == husband_lengths) & (lengths <= MAX_PATTERN_LENGTH)
+    safe_husband_lengths = np.where(in_range, husband_lengths, 0)
+    codes = (((1 << np.where(in_range, wife_lengths, 0)) | wife_bits) << safe_husband_lengths) | husband_bits
+    codes = np.where(in_range, codes, 0)
+
+    rules = _active_rules
+    entries = rules.compiled_array[codes]
+    # Rows without an exact rule fall back to the longest prefix in the trie
+    for row in np.flatnonzero((entries & _FOUND) == 0):
+        match = rules.trie.longest_prefix(wife_families[row], husband_families[row])
+        if match is not None:
+            first, second = match[0]
+            entries[row] = _FOUND | _GENDER_BITS[first] << 1 | _GENDER_BITS[second]
+    found = (entries & _FOUND) != 0
+
+    orders = np.asarray(child_numbers)
+    first = orders == 1
+    second = orders == 2
+
+    # Confidence range per row; unknown patterns use the default prediction's
+    low = np.where(found, np.where(first, 70, np.where(second, 50, 40)), 50)
+    high = np.where(found, np.where(first, 90, np.where(second, 60, 50)), 60)
+    if deterministic:
+        confidence = np.empty(count, dtype=np.int64)
+        guesses = np.empty(count, dtype=np.int64)
+
+        def draw(rows):
+            # StableRandom per row in `rows`; returns (confidence, guess) arrays
+            drawn = np.empty((2, len(rows)), dtype=np.int64)
+            for index, row in enumerate(rows):
+                stable = StableRandom(prediction_key(wife_families[row], husband_families[row], int(orders[row])))
+                drawn[0, index] = stable.randint(int(low[row]), int(high[row]))
+                drawn[1, index] = _GENDER_BITS[stable.choice(["male", "female"])]
+            return drawn
+
+        # Equal keys give equal draws, so hash each distinct (pattern, order)
+        # once and broadcast it to its rows
+        keyed = (wife_keys >= 0) & (husband_keys >= 0)
+        keyed_rows = np.flatnonzero(keyed)
+        first_rows, inverse = _distinct_rows(wife_keys[keyed_rows], husband_keys[keyed_rows], orders[keyed_rows])
+        drawn = draw(keyed_rows[first_rows])
+        confidence[keyed_rows], guesses[keyed_rows] = drawn[:, inverse]
+        # Families with unrecognized values or too long for a key
+        other_rows = np.flatnonzero(~keyed)
+        confidence[other_rows], guesses[other_rows] = draw(other_rows)
+    else:
+        confidence = rng.integers(low, high + 1)
+        guesses = rng.integers(0, 2, size=count)
+
+    gender_bits = np.where(first, (entries >> 1) & 1, np.where(second, entries & 1, guesses))
+    # Unknown patterns fall back to the default prediction
+    gender_bits = np.where(found, gender_bits, 1)
+
+    return {
+        "gender": _GENDER_NAMES[gender_bits],
+        "confidence": confidence,
+        "found": found,
+    }
+
+
 def get_explanation_ar(wife_family, husband_family, predicted_gender, child_number):
     """إنشاء شرح بالعربية للتوقع"""
     
@@ -245,3 +500,48 @@ def get_explanation_en(wife_family, husband_family, predicted_gender, child_numb
     """
     
     return explanation.strip()
+
+
+# الشروح المُعدّة مسبقاً
+# Pre-rendered explanations
+#
+# An explanation depends only on the two patterns, the predicted gender,
+# whether this is the first child, and the language. Common patterns are
+# rendered once by prerender_explanations(); anything else is rendered on
+# first use. Every text is interned, so stored records share one copy.
+EXPLANATION_CACHE_LIMIT = 20000
+_EXPLANATIONS = {}
+
+
+def _explanation_key(wife_family, husband_family, predicted_gender, child_number, language):
+    return (language == 'ar', tuple(wife_family), tuple(husband_family), predicted_gender, child_number == 1)
+
+
+def get_explanation(wife_family, husband_family, predicted_gender, child_number, language='ar'):
+    """Cached get_explanation_ar / get_explanation_en"""
+    key = _explanation_key(wife_family, husband_family, predicted_gender, child_number, language)
+    explanation = _EXPLANATIONS.get(key)
+    if explanation is None:
+        render = get_explanation_ar if language == 'ar' else get_explanation_en
+        explanation = sys.intern(render(wife_family, husband_family, predicted_gender, child_number))
+        # Arbitrary gender strings make the key space unbounded
+        if len(_EXPLANATIONS) < EXPLANATION_CACHE_LIMIT:
+            _EXPLANATIONS[key] = explanation
+    return explanation
+
+
+def prerender_explanations(max_children=3, spellings=(("male", "female"), ("ذكر", "أنثى"))):
+    """Render every pattern of up to `max_children` per family; returns the cache size"""
+    for genders in spellings:
+        patterns = [
+            list(pattern)
+            for length in range(max_children + 1)
+            for pattern in itertools.product(genders, repeat=length)
+        ]
+        for wife_family in patterns:
+            for husband_family in patterns:
+                for predicted_gender in ("male", "female"):
+                    for child_number in (1, 2):
+                        for language in ('ar', 'en'):
+                            get_explanation(wife_family, husband_family, predicted_gender, child_number, language)
+    return len(_EXPLANATIONS)
@@ -0,0 +1,317 @@
+# نظام تقييم الأمراض الوراثية
+# Genetic Disease Assessment Based on Family History
+#
+# The disease catalog lives at module level and all of its keywords are
+# compiled into one regular expression, so each family's disease list is
+# lowercased and scanned once per request however many conditions the
+# catalog holds. Names the keywords miss (misspellings, Arabic, abbreviations)
+# are resolved through the trigram index in disease_resolver.
+
+import re
+
+import numpy as np
+
+from disease_resolver import DiseaseResolver
+
+# كتالوج الأمراض الوراثية
+# Disease catalog
+#   inheritance: "autosomal_recessive" or "x_linked" (recessive)
+#   allele_frequency: population frequency of the disease allele
+#   aliases:  other names and abbreviations (both languages) for fuzzy lookup
+#   keywords: matched anywhere inside a reported disease name
+#   exact:    matched only when a reported disease name is exactly this
+#   level:    highest risk level reported for this disease
+DISEASE_CATALOG = {
+    'thalassemia': {
+        'ar': 'الثلاسيميا (أنيميا البحر المتوسط)',
+        'en': 'Thalassemia',
+        'inheritance': 'autosomal_recessive',
+        'allele_frequency': 0.025,
+        'aliases': ('thalassaemia', 'beta thalassemia', 'alpha thalassemia', 'mediterranean anemia', "cooley's anemia",
+                    'ثلاسيميا', 'انيميا البحر المتوسط', 'فقر دم البحر المتوسط'),
+        'keywords': (),
+        'exact': ('thalassemia',),
+        'level': 'high',
+    },
+    'sickle_cell': {
+        'ar': 'فقر الدم المنجلي',
+        'en': 'Sickle Cell Anemia',
+        'inheritance': 'autosomal_recessive',
+        'allele_frequency': 0.015,
+        'aliases': ('sickle cell', 'sickle cell disease', 'scd', 'hbss', 'drepanocytosis',
+                    'الانيميا المنجلية', 'انيميا منجلية', 'فقر الدم المنجلي'),
+        'keywords': ('sickle',),
+        'exact': (),
+        'level': 'high',
+    },
+    'hemophilia': {
+        'ar': 'الهيموفيليا (نزف الدم الوراثي)',
+        'en': 'Hemophilia',
+        'inheritance': 'x_linked',
+        'allele_frequency': 0.0002,
+        'aliases': ('haemophilia', 'hemophilia a', 'hemophilia b', 'هيموفيليا', 'الناعور', 'نزف الدم الوراثي'),
+        'keywords': ('hemophilia',),
+        'exact': (),
+        'level': 'high',
+    },
+    'color_blindness': {
+        'ar': 'عمى الألوان',
+        'en': 'Color Blindness',
+        'inheritance': 'x_linked',
+        'allele_frequency': 0.08,
+        'aliases': ('colour blindness', 'colorblind', 'daltonism', 'red green color blindness',
+                    'عمى الالوان', 'عمى ألوان'),
+        'keywords': ('color',),
+        'exact': (),
+        'level': 'medium',
+    },
+    'cystic_fibrosis': {
+        'ar': 'التليف الكيسي',
+        'en': 'Cystic Fibrosis',
+        'inheritance': 'autosomal_recessive',
+        'allele_frequency': 0.005,
+        'aliases': ('cf', 'mucoviscidosis', 'تليف كيسي'),
+        'keywords': ('fibrosis',),
+        'exact': (),
+        'level': 'high',
+    },
+    'duchenne': {
+        'ar': 'ضمور العضلات الدوشيني',
+        'en': 'Duchenne Muscular Dystrophy',
+        'inheritance': 'x_linked',
+        'allele_frequency': 0.0003,
+        'aliases': ('dmd', 'duchenne', 'muscular dystrophy', 'ضمور دوشين', 'ضمور العضلات'),
+        'keywords': ('duchenne',),
+        'exact': (),
+        'level': 'high',
+    },
+    'g6pd_deficiency': {
+        'ar': 'نقص إنزيم G6PD (أنيميا الفول)',
+        'en': 'G6PD Deficiency',
+        'inheritance': 'x_linked',
+        'allele_frequency': 0.05,
+        'aliases': ('g6pd', 'favism', 'glucose 6 phosphate dehydrogenase deficiency',
+                    'أنيميا الفول', 'فوال', 'نقص انزيم g6pd'),
+        'keywords': ('g6pd', 'favism'),
+        'exact': (),
+        'level': 'medium',
+    },
+}
+
+
+class DiseaseMatcher:
+    """
+    One compiled pass over a family's disease names for every catalog keyword.
+
+    The pattern is a zero-width lookahead tried at every position, longest
+    keyword first; keywords contained in a longer match are added from a
+    precomputed table, so overlapping keywords are all found.
+    """
+
+    def __init__(self, catalog):
+        self._keyword_diseases = {}
+        self._exact_diseases = {}
+        for key, disease in catalog.items():
+            for keyword in disease['keywords']:
+                self._keyword_diseases.setdefault(keyword.lower(), set()).add(key)
+            for name in disease['exact']:
+                self._exact_diseases.setdefault(name.lower(), set()).add(key)
+
+        keywords = sorted(self._keyword_diseases, key=len, reverse=True)
+        self._pattern = re.compile(
+            "(?=(" + "|".join(re.escape(k) for k in keywords) + "))"
+        ) if keywords else None
+        # Diseases implied by each matched keyword, including shorter keywords inside it
+        self._implied = {
+            keyword: frozenset().union(*(
+                self._keyword_diseases[other] for other in keywords if other in keyword
+            ))
+            for keyword in keywords
+        }
+
+    def match(self, names):
+        """Return the set of catalog keys found in a list of disease names"""
+        if not names:
+            return set()
+        # Names are joined with newlines, which no keyword contains
+        text = "\n".join(names).lower()
+        found = set()
+        if self._pattern is not None:
+            for keyword in set(self._pattern.findall(text)):
+                found |= self._implied[keyword]
+        if self._exact_diseases:
+            for name in set(text.split("\n")).intersection(self._exact_diseases):
+                found |= self._exact_diseases[name]
+        return found
+
+
+DISEASE_MATCHER = DiseaseMatcher(DISEASE_CATALOG)
+# Free-text names (misspellings, Arabic, abbreviations) the keywords miss
+DISEASE_RESOLVER = DiseaseResolver(DISEASE_CATALOG)
+
+
+def resolve_disease(name, language='ar', limit=3):
+    """Ranked canonical conditions for one free-text disease name"""
+    name_key = 'ar' if language == 'ar' else 'en'
+    return [
+        {'key': key, 'name': DISEASE_CATALOG[key][name_key], 'score': score}
+        for key, score in DISEASE_RESOLVER.resolve(name, limit)
+    ]
+
+
+# Mendelian risk engine
+#
+# Each parent is a carrier with the population probability 2q(1-q), raised to
+# FAMILY_HISTORY_CARRIER when the disease is reported in that parent's family.
+# The child's probability of being affected is then:
+#   autosomal recessive: P(mother carrier) * P(father carrier) / 4
+#   X-linked, son:       P(mother carrier) / 2
+#   X-linked, daughter:  P(mother carrier) / 2 * P(father affected = q)
+# Every step is an array operation over (couples x diseases), so scoring a
+# screening batch costs the same per row as scoring one couple.
+
+# Carrier probability of a parent with the disease in their family (e.g. the
+# unaffected sibling or niece of an affected relative)
+FAMILY_HISTORY_CARRIER = 0.5
+
+# Risk levels from the excess probability over a couple without family
+# history, highest first, per inheritance mode; each disease is capped at its
+# catalog level. Autosomal recessive risk tops out at 1/16 (both parents
+# 50% carriers), X-linked at 1/4 (son of a 50% carrier mother), so each
+# mode has its own scale.
+RISK_LEVEL_THRESHOLDS = {
+    'autosomal_recessive': ((0.05, 'high'), (0.001, 'medium')),
+    'x_linked': ((0.10, 'high'), (0.01, 'medium')),
+}
+RISK_LEVELS = ('low', 'medium', 'high')
+
+DISEASE_KEYS = tuple(DISEASE_CATALOG)
+for _key in DISEASE_KEYS:
+    if DISEASE_CATALOG[_key]['inheritance'] not in RISK_LEVEL_THRESHOLDS:
+        raise ValueError(f"Unsupported inheritance for {_key}: {DISEASE_CATALOG[_key]['inheritance']}")
+
+_DISEASE_INDEX = {key: index for index, key in enumerate(DISEASE_KEYS)}
+_ALLELE_FREQUENCY = np.array([DISEASE_CATALOG[key]['allele_frequency'] for key in DISEASE_KEYS])
+_POPULATION_CARRIER = 2 * _ALLELE_FREQUENCY * (1 - _ALLELE_FREQUENCY)
+_X_LINKED = np.array([DISEASE_CATALOG[key]['inheritance'] == 'x_linked' for key in DISEASE_KEYS])
+_MAX_LEVEL = np.array([RISK_LEVELS.index(DISEASE_CATALOG[key]['level']) for key in DISEASE_KEYS])
+_RISK_LEVEL_NAMES = np.array(RISK_LEVELS)
+
+
+def _level_threshold(key, level):
+    thresholds = RISK_LEVEL_THRESHOLDS[DISEASE_CATALOG[key]['inheritance']]
+    return next((threshold for threshold, name in thresholds if name == level), 0.0)
+
+
+# Minimum excess probability for each level (rows, 'low' = 0) and disease (columns)
+_LEVEL_THRESHOLDS = np.array([[_level_threshold(key, level) for key in DISEASE_KEYS] for level in RISK_LEVELS])
+
+
+def family_history_matrix(families):
+    """Boolean (rows x diseases) matrix of the catalog diseases reported per family"""
+    history = np.zeros((len(families), len(DISEASE_KEYS)), dtype=bool)
+    # Screening batches repeat the same few names; match each one once
+    columns_by_name = {}
+    for row, names in enumerate(families):
+        for name in names:
+            columns = columns_by_name.get(name)
+            if columns is None:
+                found = DISEASE_MATCHER.match([name]) | DISEASE_RESOLVER.match([name])
+                columns = columns_by_name[name] = [_DISEASE_INDEX[key] for key in found]
+            history[row, columns] = True
+    return history
+
+
+def male_probability(genders):
+    """1.0 for 'male', 0.0 for 'female', 0.5 when the baby's sex is unknown"""
+    return np.array([1.0 if g == 'male' else 0.0 if g == 'female' else 0.5 for g in genders])
+
+
+def mendelian_probabilities(wife_history, husband_history, male):
+    """
+    Probability that the child is affected, per couple and catalog disease.
+
+    Args:
+        wife_history, husband_history: bool arrays (rows x diseases)
+        male: probability that each child is male, shape (rows,)
+
+    Returns:
+        float array (rows x diseases)
+    """
+    mother_carrier = np.where(wife_history, FAMILY_HISTORY_CARRIER, _POPULATION_CARRIER)
+    father_carrier = np.where(husband_history, FAMILY_HISTORY_CARRIER, _POPULATION_CARRIER)
+    recessive = mother_carrier * father_carrier * 0.25
+    son = mother_carrier * 0.5
+    daughter = son * _ALLELE_FREQUENCY
+    male = np.asarray(male, dtype=float)[:, None]
+    x_linked = male * son + (1 - male) * daughter
+    return np.where(_X_LINKED, x_linked, recessive)
+
+
+def _risk_level_index(excess):
+    """Index into RISK_LEVELS of the highest level whose threshold the excess reaches"""
+    levels = np.zeros(excess.shape, dtype=np.int64)
+    for index in range(1, len(RISK_LEVELS)):
+        levels[excess >= _LEVEL_THRESHOLDS[index]] = index
+    return levels
+
+
+def assess_genetic_risk_batch(wife_families, husband_families, genders):
+    """
+    تقييم المخاطر الوراثية لمجموعة من الأزواج دفعة واحدة
+
+    Args:
+        wife_families, husband_families: lists of reported disease names, one per couple
+        genders: 'male', 'female' (anything else is treated as unknown)
+
+    Returns:
+        dict: {"probabilities": (rows x diseases) floats in DISEASE_KEYS order,
+               "levels": (rows x diseases) level names,
+               "risk_percentage": int array (chance of any catalog disease),
+               "risk_level": array of the highest level per couple}
+    """
+    if not len(wife_families) == len(husband_families) == len(genders):
+        raise ValueError("wife_families, husband_families and genders must have the same length")
+    male = male_probability(genders)
+    probabilities = mendelian_probabilities(
+        family_history_matrix(wife_families), family_history_matrix(husband_families), male
+    )
+    no_history = np.zeros(probabilities.shape, dtype=bool)
+    baseline = mendelian_probabilities(no_history, no_history, male)
+
+    levels = np.minimum(_risk_level_index(probabilities - baseline), _MAX_LEVEL)
+    overall = 1 - np.prod(1 - probabilities, axis=1)
+    return {
+        "probabilities": probabilities,
+        "levels": _RISK_LEVEL_NAMES[levels],
+        "risk_percentage": np.rint(overall * 100).astype(np.int64),
+        "risk_level": _RISK_LEVEL_NAMES[levels.max(axis=1, initial=0)],
+    }
+
+
+def assess_genetic_risk(wife_family_diseases, husband_family_diseases, gender):
+    """Single-couple assess_genetic_risk_batch: {"risk_percentage", "risk_level", "diseases"}"""
+    result = assess_genetic_risk_batch([wife_family_diseases], [husband_family_diseases], [gender])
+    return {
+        "risk_percentage": int(result["risk_percentage"][0]),
+        "risk_level": str(result["risk_level"][0]),
+        "diseases": {
+            key: (float(result["probabilities"][0, index]), str(result["levels"][0, index]))
+            for index, key in enumerate(DISEASE_KEYS)
+        },
+    }
+
+
+def get_diseases_info(wife_family_diseases, husband_family_diseases, gender, language='ar', assessment=None):
+    """Localized [{"name", "risk_level", "probability"}] for every catalog disease"""
+    if assessment is None:
+        assessment = assess_genetic_risk(wife_family_diseases, husband_family_diseases, gender)
+    name_key = 'ar' if language == 'ar' else 'en'
+    return [
+        {
+            'name': DISEASE_CATALOG[key][name_key],
+            'risk_level': level,
+            'probability': round(probability * 100, 2),
+        }
+        for key, (probability, level) in assessment["diseases"].items()
+    ]
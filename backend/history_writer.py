@@ -0,0 +1,140 @@
+# كتابة سجل التوقعات على دفعات
+# Write-behind buffer for prediction history
+#
+# Endpoints hand their history documents to this buffer instead of awaiting
+# a database round trip. A background task flushes them with insert_many,
+# either when a batch is full or after a short interval.
+
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop(): everything before it is written, then the flush task ends
+_STOP = object()
+
+
+class HistoryWriter:
+    """Bounded write-behind buffer flushed with insert_many(ordered=False)"""
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Any],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        put_timeout: float = 1.0,
+        on_written: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.get_collection = get_collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        # Called with each batch once it is stored (e.g. to update statistics)
+        self.on_written = on_written
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._stop_seen = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._closing = False
+        self._stop_seen = False
+        self._task = asyncio.create_task(self._run())
+
+    async def add(self, document: dict):
+        """Buffer a document; waits (up to put_timeout) while the buffer is full"""
+        if self._task is None or self._closing:
+            # Not started (e.g. no event loop lifecycle) or stopping - write directly
+            await self._write([document])
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(document), self.put_timeout)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning("History buffer full, dropping prediction record")
+
+    async def stop(self):
+        """Flush everything still buffered, then stop the flush task"""
+        if self._task is None:
+            return
+        self._closing = True
+        # The flush task drains the buffer up to the marker and finishes its
+        # current write, so every buffered record is stored (and counted)
+        if not self._task.done():
+            await self._queue.put(_STOP)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
+
+    def metrics(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _accept(self, batch: List[dict], document) -> bool:
+        """Add a dequeued item to batch; False once the stop marker is reached"""
+        if document is _STOP:
+            self._stop_seen = True
+            return False
+        batch.append(document)
+        return True
+
+    def _take(self, batch: List[dict], limit: int):
+        while len(batch) < limit and not self._queue.empty():
+            if not self._accept(batch, self._queue.get_nowait()):
+                return
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop_seen:
+            batch = []
+            if not self._accept(batch, await self._queue.get()):
+                break
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop_seen:
+                self._take(batch, self.batch_size)
+                remaining = deadline - loop.time()
+                if len(batch) >= self.batch_size or self._stop_seen or remaining <= 0:
+                    break
+                try:
+                    document = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._accept(batch, document)
+            await self._write(batch)
+
+    async def _write(self, batch: List[dict]):
+        if not batch:
+            return
+        try:
+            collection = self.get_collection()
+            if len(batch) == 1:
+                await collection.insert_one(batch[0])
+            else:
+                await collection.insert_many(batch, ordered=False)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception(f"Failed to save {len(batch)} prediction record(s) to the database")
+            return
+        self.written += len(batch)
+        if self.on_written is not None:
+            self.on_written(batch)
@@ -0,0 +1,151 @@
+# ذاكرة تخزين مؤقت لشروحات الذكاء الاصطناعي
+# Two-tier cache for AI explanations (in-memory LRU + SQLite on disk)
+#
+# Prompts come from a small input space (a few diseases, a finite set of
+# traits, 2 languages), so after warm-up most explanations are cache hits.
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting differences share one entry"""
+    return " ".join(prompt.split())
+
+
+def cache_key(prompt: str, language: str, model: str) -> str:
+    content = "\x1f".join((model, language, normalize_prompt(prompt)))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """Content-addressed explanation cache keyed on prompt, language and model"""
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        max_entries: int = 2048,
+        ttl: float = 24 * 3600,
+        disk_ttl: float = 30 * 24 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path):
+        try:
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS explanations ("
+                "key TEXT PRIMARY KEY, language TEXT, model TEXT, "
+                "response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Explanation cache disk tier disabled: {e}")
+            self._conn = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_enabled": self._conn is not None,
+        }
+
+    async def get(self, prompt: str, language: str, model: str) -> Optional[str]:
+        key = cache_key(prompt, language, model)
+        response = self._get_memory(key)
+        if response is not None:
+            self.hits += 1
+            return response
+        if self._conn is not None:
+            response = await asyncio.to_thread(self._get_disk, key)
+            if response is not None:
+                self.disk_hits += 1
+                self._put_memory(key, response)
+                return response
+        self.misses += 1
+        return None
+
+    async def set(self, prompt: str, language: str, model: str, response: str):
+        key = cache_key(prompt, language, model)
+        self._put_memory(key, response)
+        if self._conn is not None:
+            await asyncio.to_thread(self._put_disk, key, language, model, response)
+
+    def clear(self):
+        self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM explanations")
+                self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return response
+
+    def _put_memory(self, key: str, response: str):
+        self._memory[key] = (response, time.monotonic() + self.ttl)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM explanations WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Explanation cache read error: {e}")
+            return None
+        if row is None or row[1] + self.disk_ttl < time.time():
+            return None
+        return row[0]
+
+    def _put_disk(self, key: str, language: str, model: str, response: str):
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO explanations (key, language, model, response, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, language, model, response, time.time()),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Explanation cache write error: {e}")
@@ -0,0 +1,155 @@
+# مدير عميل نموذج اللغة
+# Long-lived LLM client manager: concurrency cap, deadlines, circuit breaker
+#
+# A slow or failing provider must not pile up coroutines, so every upstream
+# call goes through one manager that bounds how many run at once, gives each
+# a deadline, and stops calling the provider for a while after repeated
+# failures.
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, lets one trial call through after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def release_trial(self):
+        """Forget a trial call that ended without a verdict (e.g. cancelled)"""
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LlmClientManager:
+    """Runs upstream LLM calls with a concurrency cap, per-call deadline and circuit breaker"""
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable[Any]],
+        max_concurrency: int = 8,
+        timeout: float = 20.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        latency_window: int = 512,
+    ):
+        self.send = send
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._latencies = deque(maxlen=latency_window)
+        self.waiting = 0
+        self.active = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    async def call(self, prompt: str, language: str) -> Any:
+        """Returns whatever send returns"""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("LLM provider circuit is open")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.calls += 1
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.send(prompt, language), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # The caller went away; this says nothing about provider health
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+            return response
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            self.active -= 1
+            self._semaphore.release()
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 1)
+
+        return {
+            "queue_depth": self.waiting,
+            "active_calls": self.active,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected_by_circuit": self.rejected,
+            "circuit_state": self.breaker.state,
+            "latency_ms": {
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+            },
+        }
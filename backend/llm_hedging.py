@@ -0,0 +1,143 @@
+# إرسال طلب احتياطي لمزود بديل عند التأخر
+# Hedged LLM requests: race an alternate provider when the primary is slow
+#
+# If the primary has not answered within a delay taken from its own recent
+# latency percentile, the same prompt is sent to the alternate provider. The
+# first successful answer wins and the other call is cancelled.
+#
+# A cancelled call still records how long it had been running: the loser of a
+# race is by definition the slow one, and dropping it would leave only fast
+# samples behind and pull the hedge delay down over time.
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple
+
+SendFunction = Callable[[str, str], Awaitable[str]]
+
+
+class ProviderStats:
+    """Latency and outcome counters for one provider"""
+
+    def __init__(self, name: str, window: int = 512):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.wins = 0
+        self.failures = 0
+        self.cancelled = 0
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "wins": self.wins,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "latency_ms": {
+                "p50": ms(self.percentile(50)),
+                "p95": ms(self.percentile(95)),
+                "p99": ms(self.percentile(99)),
+            },
+        }
+
+
+class HedgedSender:
+    """Send to the primary provider, hedge to the alternate after a percentile-based delay"""
+
+    def __init__(
+        self,
+        primary_name: str,
+        primary: SendFunction,
+        alternate_name: str,
+        alternate: SendFunction,
+        hedge_percentile: float = 95,
+        default_delay: float = 2.0,
+        min_delay: float = 0.2,
+        min_samples: int = 20,
+    ):
+        self.providers = [
+            (ProviderStats(primary_name), primary),
+            (ProviderStats(alternate_name), alternate),
+        ]
+        self.hedge_percentile = hedge_percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.hedges = 0
+
+    def hedge_delay(self) -> float:
+        """Primary's recent latency percentile, or the default until there is enough data"""
+        stats = self.providers[0][0]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, stats.percentile(self.hedge_percentile))
+
+    async def send(self, prompt: str, language: str) -> str:
+        _, response = await self.send_with_provider(prompt, language)
+        return response
+
+    async def send_with_provider(self, prompt: str, language: str) -> Tuple[str, str]:
+        """Like send, but also returns the name of the provider that answered"""
+        primary_task = asyncio.ensure_future(self._timed(0, prompt, language))
+        tasks = [primary_task]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if done and primary_task.exception() is None:
+                return self._win(0, primary_task)
+
+            # Primary is slow (or already failed): race the alternate
+            self.hedges += 1
+            tasks.append(asyncio.ensure_future(self._timed(1, prompt, language)))
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._win(tasks.index(task), task)
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def metrics(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1),
+            "providers": {stats.name: stats.summary() for stats, _ in self.providers},
+        }
+
+    def _win(self, index: int, task: asyncio.Future) -> Tuple[str, str]:
+        stats = self.providers[index][0]
+        stats.wins += 1
+        return stats.name, task.result()
+
+    async def _timed(self, index: int, prompt: str, language: str) -> str:
+        stats, send = self.providers[index]
+        stats.calls += 1
+        started = time.perf_counter()
+        try:
+            response = await send(prompt, language)
+        except asyncio.CancelledError:
+            # Lower bound: the call would have taken at least this long
+            stats.cancelled += 1
+            stats.latencies.append(time.perf_counter() - started)
+            raise
+        except Exception:
+            stats.failures += 1
+            raise
+        stats.latencies.append(time.perf_counter() - started)
+        return response
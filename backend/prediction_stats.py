@@ -0,0 +1,67 @@
+# إحصائيات التوقعات المحدثة تدريجياً
+# Incrementally maintained prediction statistics
+#
+# Counters are updated as history records are persisted and rebuilt from
+# storage once at startup, so /api/statistics answers from memory instead of
+# running count queries on every call.
+
+from collections import Counter
+from datetime import datetime
+from typing import Iterable
+
+# Prediction types always reported, even at zero
+PREDICTION_TYPES = ("gender", "genetic", "traits")
+
+
+class PredictionStatistics:
+    def __init__(self):
+        # False until rebuild() has loaded the counts already in storage
+        self.ready = False
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.by_type = Counter({prediction_type: 0 for prediction_type in PREDICTION_TYPES})
+        self.by_day = Counter()
+        self.by_language = Counter()
+        self.by_predicted_gender = Counter()
+
+    def record(self, document: dict):
+        self.total += 1
+        self.by_type[document.get("type")] += 1
+
+        timestamp = document.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if isinstance(timestamp, datetime):
+            self.by_day[timestamp.date().isoformat()] += 1
+
+        language = (document.get("data") or {}).get("language")
+        if language:
+            self.by_language[language] += 1
+
+        predicted_gender = (document.get("result") or {}).get("predicted_gender")
+        if predicted_gender:
+            self.by_predicted_gender[predicted_gender] += 1
+
+    def record_many(self, documents: Iterable[dict]):
+        for document in documents:
+            self.record(document)
+
+    async def rebuild(self, db, exclude: Iterable[str] = ()):
+        """Recount everything from storage (one pass, batched)"""
+        projection = {"_id": 0}
+        projection.update({field: 0 for field in exclude})
+        self.reset()
+        async for document in db.predictions.find({}, projection).batch_size(1000):
+            self.record(document)
+        self.ready = True
+
+    def snapshot(self) -> dict:
+        return {
+            "total_predictions": self.total,
+            "by_type": dict(self.by_type),
+            "by_day": dict(sorted(self.by_day.items())),
+            "by_language": dict(self.by_language),
+            "by_predicted_gender": dict(self.by_predicted_gender),
+        }
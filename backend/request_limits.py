@@ -0,0 +1,97 @@
+# حدود حجم الطلبات
+# Request body size limits
+#
+# Rejects oversized bodies before FastAPI reads, parses or validates them.
+# A declared Content-Length is checked up front; chunked bodies are counted
+# as they arrive and cut off as soon as they pass the limit.
+
+import json
+from typing import Callable, Dict, Optional
+
+from starlette.exceptions import HTTPException
+
+
+def _too_large_detail(limit: int) -> str:
+    return f"Request body too large (limit {limit} bytes)"
+
+
+class _BodyTooLarge(HTTPException):
+    """Raised from receive() for a streamed body over the limit.
+
+    An HTTPException, so FastAPI's body reader re-raises it instead of turning
+    it into a 400 parse error, and the app answers 413.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=_too_large_detail(limit))
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware: 413 for request bodies above the limit for their path"""
+
+    def __init__(self, app, max_bytes: int = 65536, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        # Endpoints that legitimately take bigger bodies: exact path -> limit
+        self.path_limits = dict(path_limits or {})
+        self.rejected = 0
+
+    def limit_for(self, path: str) -> int:
+        return self.path_limits.get(path, self.max_bytes)
+
+    async def __call__(self, scope, receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope["path"])
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    await self._reject(send, limit)
+                    return
+                break
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    self.rejected += 1
+                    raise _BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            # Not handled inside the app (e.g. read outside a route)
+            if started:
+                raise
+            await self._send_413(send, limit)
+
+    async def _reject(self, send: Callable, limit: int):
+        self.rejected += 1
+        await self._send_413(send, limit)
+
+    async def _send_413(self, send: Callable, limit: int):
+        body = json.dumps({"detail": _too_large_detail(limit)}, separators=(",", ":")).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,87 @@
+# إعادة تحميل ملف القواعد أثناء التشغيل
+# Hot reload for the prediction rule file
+#
+# The file is polled for changes (modification time and size) and can also be
+# reloaded on demand, e.g. from a SIGHUP handler. A new file is loaded and
+# validated off the event loop; only a valid rule set is handed to on_reload,
+# so a broken or half-written file leaves the current rules in place.
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RuleFileWatcher:
+    def __init__(
+        self,
+        path: Path,
+        load: Callable[[Path], Any],
+        on_reload: Callable[[Any], None],
+        interval: float = 5.0,
+    ):
+        self.path = Path(path)
+        self.load = load
+        self.on_reload = on_reload
+        self.interval = interval
+        self._signature = self._stat()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def reload(self, force: bool = True) -> bool:
+        """Load the file if it changed (or always when forced); True if rules were swapped"""
+        async with self._lock:
+            signature = self._stat()
+            if signature is None or (not force and signature == self._signature):
+                return False
+            try:
+                rules = await asyncio.to_thread(self.load, self.path)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                # Remember the broken file so it is not retried until it changes again
+                self._signature = signature
+                logger.error(f"Rule file {self.path} rejected, keeping current rules: {e}")
+                return False
+            self._signature = signature
+            self.on_reload(rules)
+            self.reloads += 1
+            self.last_error = None
+            return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.reload(force=False)
+
+    def metrics(self) -> dict:
+        return {
+            "path": str(self.path),
+            "watching": self._task is not None,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
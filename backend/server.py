@@ -1,14 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Response
+from fastapi.routing import APIRoute
+from fastapi.responses import StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, BeforeValidator, Field, field_validator
+from pydantic_core import PydanticKnownError
+from typing import Annotated, List, Optional, Tuple
 import uuid
+import json
+import base64
+import signal
+import asyncio
+from collections import OrderedDict
 from datetime import datetime
-from gender_prediction_logic import predict_gender, get_explanation_ar, get_explanation_en
+from gender_prediction_logic import (
+    predict_gender, predict_gender_batch, prediction_key, get_explanation, prerender_explanations,
+    DEFAULT_RULES_PATH, load_rules, swap_rules, active_rules, is_known_gender
+)
+from genetic_prediction_logic import assess_genetic_risk, assess_genetic_risk_batch, get_diseases_info, resolve_disease
+from traits_prediction_logic import (
+    predict_traits as predict_traits_from_parents, parent_scores, summarize_simulation, validate_trait_values
+)
+from trait_simulator import TraitSimulator
+from explanation_queue import ExplanationQueue
+from llm_cache import ExplanationCache, cache_key
+from single_flight import SingleFlight
+from llm_client import LlmClientManager
+from llm_hedging import HedgedSender
+from history_writer import HistoryWriter
+from storage import open_database, ensure_indexes, naive_utc
+from data_export import EXPORT_FORMATS, export_stream
+from prediction_stats import PredictionStatistics
+from rule_reloader import RuleFileWatcher
+from fast_routes import FastJSONRoute
+from request_limits import BodySizeLimitMiddleware
 
 # Try to import AI chat functionality (optional)
 try:
@@ -23,9 +53,31 @@ load_dotenv(ROOT_DIR / '.env')
 
 # Get API key for AI functionality (optional)
 EMERGENT_LLM_KEY = os.getenv('EMERGENT_LLM_KEY')
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-4o-mini"
+PRIMARY_MODEL = f"{LLM_PROVIDER}/{LLM_MODEL}"
+# Optional alternate model for hedged requests, e.g. "anthropic/claude-3-5-haiku-latest"
+LLM_HEDGE_MODEL = os.getenv('LLM_HEDGE_MODEL')
 
-# No database for now - predictions work without saving history
-db = None
+# Cache of generated explanations, kept on disk across restarts
+explanation_cache = ExplanationCache(
+    path=os.getenv('EXPLANATION_CACHE_PATH', str(ROOT_DIR / 'explanation_cache.db')),
+    max_entries=int(os.getenv('EXPLANATION_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('EXPLANATION_CACHE_TTL', str(24 * 3600)))
+)
+
+# Concurrent requests for the same prompt share one upstream LLM call
+llm_single_flight = SingleFlight()
+
+# History storage: "none" (predictions work without saving history),
+# "sqlite" (embedded file, no outside service) or "mongo"
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'none')
+db = open_database(
+    STORAGE_BACKEND,
+    path=os.getenv('SQLITE_PATH', str(ROOT_DIR / 'predictions.db')),
+    mongo_url=os.getenv('MONGO_URL'),
+    db_name=os.getenv('DB_NAME', 'test_database')
+)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -33,15 +85,69 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Hot prediction endpoints: validated from raw bytes and serialized with orjson
+FAST_PATH = os.getenv('FAST_PATH', 'true').lower() in ('1', 'true', 'yes')
+hot_router = APIRouter(prefix="/api", route_class=FastJSONRoute if FAST_PATH else APIRoute)
+
+# Input limits: bodies over the byte limit are refused before they are read
+# or parsed, and list lengths are checked before their items are validated
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', str(64 * 1024)))
+MAX_FAMILY_CHILDREN = int(os.getenv('MAX_FAMILY_CHILDREN', '50'))
+MAX_FAMILY_DISEASES = int(os.getenv('MAX_FAMILY_DISEASES', '10'))
+MAX_DISEASE_NAME_LENGTH = int(os.getenv('MAX_DISEASE_NAME_LENGTH', '64'))
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '10000'))
+
+def bounded(limit: int):
+    """Reject a list over `limit` items before any item is validated"""
+    def check_length(value):
+        if isinstance(value, (list, tuple)) and len(value) > limit:
+            raise PydanticKnownError(
+                "too_long", {"field_type": "List", "max_length": limit, "actual_length": len(value)}
+            )
+        return value
+    return BeforeValidator(check_length)
+
+DiseaseName = Annotated[str, Field(max_length=MAX_DISEASE_NAME_LENGTH)]
+FamilyPattern = Annotated[List[str], Field(max_length=MAX_FAMILY_CHILDREN), bounded(MAX_FAMILY_CHILDREN)]
+FamilyDiseases = Annotated[List[DiseaseName], Field(max_length=MAX_FAMILY_DISEASES), bounded(MAX_FAMILY_DISEASES)]
+
+# Batch byte caps: MAX_BATCH_SIZE rows of the largest valid row, sized as JSON
+# with every character \u-escaped plus separators and indentation per item
+JSON_CHAR_BYTES = 6
+JSON_ITEM_OVERHEAD = 8
+
+def json_list_bytes(items: int, item_bytes: int) -> int:
+    return 2 + items * (item_bytes + JSON_ITEM_OVERHEAD)
+
+GENDER_BATCH_ROW_BYTES = (
+    json_list_bytes(1, 11)  # current pregnancy order
+    + 2 * json_list_bytes(MAX_FAMILY_CHILDREN, 2 + 4 * JSON_CHAR_BYTES)  # longest gender: 'أنثى'
+)
+GENETIC_BATCH_ROW_BYTES = (
+    json_list_bytes(1, 2 + len("unknown"))
+    + 2 * json_list_bytes(MAX_FAMILY_DISEASES, 2 + MAX_DISEASE_NAME_LENGTH * JSON_CHAR_BYTES)
+)
+BATCH_REQUEST_BYTES = {
+    "/api/predict-gender/batch": 1024 + MAX_BATCH_SIZE * GENDER_BATCH_ROW_BYTES,
+    "/api/predict-genetic-diseases/batch": 1024 + MAX_BATCH_SIZE * GENETIC_BATCH_ROW_BYTES,
+}
+
 # Define Models
+def check_gender(value: str) -> str:
+    if not is_known_gender(value):
+        raise ValueError("gender must be 'male' or 'female' (or 'ذكر' / 'أنثى')")
+    return value
+
 class Child(BaseModel):
     order: int
     gender: str  # 'male' or 'female'
 
+    _check_gender = field_validator("gender")(check_gender)
+
 class GenderPredictionRequest(BaseModel):
     current_pregnancy_order: int
-    wife_family_children: List[Child]
-    husband_family_children: List[Child]
+    wife_family_children: Annotated[List[Child], bounded(MAX_FAMILY_CHILDREN)] = Field(max_length=MAX_FAMILY_CHILDREN)
+    husband_family_children: Annotated[List[Child], bounded(MAX_FAMILY_CHILDREN)] = Field(max_length=MAX_FAMILY_CHILDREN)
     language: str = 'ar'  # 'ar' or 'en'
 
 class GenderPredictionResponse(BaseModel):
@@ -49,17 +155,60 @@ class GenderPredictionResponse(BaseModel):
     confidence_percentage: int
     # explanation and patterns stored in DB only, not sent to user
 
+class GenderBatchPredictionRequest(BaseModel):
+    # One entry per family history; patterns are genders ordered by child order
+    current_pregnancy_orders: Annotated[List[int], bounded(MAX_BATCH_SIZE)] = Field(max_length=MAX_BATCH_SIZE)
+    wife_family_patterns: Annotated[List[FamilyPattern], bounded(MAX_BATCH_SIZE)] = Field(max_length=MAX_BATCH_SIZE)
+    husband_family_patterns: Annotated[List[FamilyPattern], bounded(MAX_BATCH_SIZE)] = Field(max_length=MAX_BATCH_SIZE)
+
+    @field_validator("wife_family_patterns", "husband_family_patterns")
+    @classmethod
+    def check_pattern_genders(cls, patterns: List[List[str]]) -> List[List[str]]:
+        for pattern in patterns:
+            for gender in pattern:
+                check_gender(gender)
+        return patterns
+
+class GenderBatchPredictionResponse(BaseModel):
+    predicted_genders: List[str]
+    confidence_percentages: List[int]
+
 class GeneticDiseaseRequest(BaseModel):
-    wife_family_diseases: List[str]
-    husband_family_diseases: List[str]
+    wife_family_diseases: FamilyDiseases
+    husband_family_diseases: FamilyDiseases
     gender: str  # 'male' or 'female'
     language: str = 'ar'
 
+    @field_validator("gender")
+    @classmethod
+    def check_baby_gender(cls, value: str) -> str:
+        if value not in ("male", "female"):
+            raise ValueError("gender must be 'male' or 'female'")
+        return value
+
 class GeneticDiseaseResponse(BaseModel):
     risk_percentage: int
     risk_level: str
     # detailed_explanation stored in DB only
 
+class GeneticBatchRequest(BaseModel):
+    # One entry per couple
+    wife_family_diseases: Annotated[List[FamilyDiseases], bounded(MAX_BATCH_SIZE)] = Field(max_length=MAX_BATCH_SIZE)
+    husband_family_diseases: Annotated[List[FamilyDiseases], bounded(MAX_BATCH_SIZE)] = Field(max_length=MAX_BATCH_SIZE)
+    genders: Annotated[List[str], bounded(MAX_BATCH_SIZE)] = Field(max_length=MAX_BATCH_SIZE)  # 'male', 'female' or 'unknown'
+
+    @field_validator("genders")
+    @classmethod
+    def check_baby_genders(cls, values: List[str]) -> List[str]:
+        for value in values:
+            if value not in ("male", "female", "unknown"):
+                raise ValueError("genders must be 'male', 'female' or 'unknown'")
+        return values
+
+class GeneticBatchResponse(BaseModel):
+    risk_percentages: List[int]
+    risk_levels: List[str]
+
 class PredictionHistory(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     type: str  # 'gender' or 'genetic'
@@ -122,70 +271,229 @@ def predict_gender_from_pattern(current_order: int, wife_children: List[Child],
     
     return predicted_gender, confidence, wife_pattern, husband_pattern
 
+def explanation_unavailable(language: str) -> str:
+    return "تفسير غير متوفر حالياً" if language == 'ar' else "Explanation not available"
+
+async def send_llm_message(prompt: str, language: str, provider: str = LLM_PROVIDER, model: str = LLM_MODEL) -> str:
+    # LlmChat keeps the conversation per session, so each prompt gets its own
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=str(uuid.uuid4()),
+        system_message=f"You are a helpful assistant providing information about baby gender prediction and genetics. Respond in {'Arabic' if language == 'ar' else 'English'}."
+    ).with_model(provider, model)
+    
+    user_message = UserMessage(text=prompt)
+    return await chat.send_message(user_message)
+
+# Hedging mode: if the primary model is slower than its own recent p95, the
+# prompt is also sent to LLM_HEDGE_MODEL and the first answer wins
+llm_hedger = None
+if LLM_HEDGE_MODEL:
+    hedge_provider, hedge_model = LLM_HEDGE_MODEL.split('/', 1)
+    llm_hedger = HedgedSender(
+        PRIMARY_MODEL,
+        lambda prompt, language: send_llm_message(prompt, language),
+        LLM_HEDGE_MODEL,
+        lambda prompt, language: send_llm_message(prompt, language, hedge_provider, hedge_model),
+        hedge_percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', '95')),
+        default_delay=float(os.getenv('LLM_HEDGE_DELAY', '2'))
+    )
+
+# Models whose cached answers may be served, primary first
+EXPLANATION_MODELS = [PRIMARY_MODEL] + ([LLM_HEDGE_MODEL] if LLM_HEDGE_MODEL else [])
+
+async def send_explanation_request(prompt: str, language: str) -> Tuple[str, str]:
+    """Returns (model that answered, response)"""
+    if llm_hedger is not None:
+        return await llm_hedger.send_with_provider(prompt, language)
+    return PRIMARY_MODEL, await send_llm_message(prompt, language)
+
+# Every upstream call goes through one manager: concurrency cap, deadline and
+# circuit breaker (fallback text is returned right away while it is open)
+llm_client = LlmClientManager(
+    send_explanation_request,
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+    timeout=float(os.getenv('LLM_TIMEOUT', '20')),
+    failure_threshold=int(os.getenv('LLM_CIRCUIT_FAILURES', '5')),
+    reset_timeout=float(os.getenv('LLM_CIRCUIT_RESET', '30'))
+)
+
+async def request_ai_explanation(prompt: str, language: str) -> str:
+    """Call the LLM and cache the answer under the model that gave it (raises on failure)"""
+    model, response = await llm_client.call(prompt, language)
+    await explanation_cache.set(prompt, language, model, response)
+    return response
+
+async def get_cached_explanation(prompt: str, language: str) -> Optional[str]:
+    for model in EXPLANATION_MODELS:
+        cached = await explanation_cache.get(prompt, language, model)
+        if cached is not None:
+            return cached
+    return None
+
 # Helper function to get AI explanation
-async def get_ai_explanation(prompt: str, language: str) -> str:
+async def get_ai_explanation(prompt: str, language: str, raise_errors: bool = False) -> str:
     if not AI_AVAILABLE or not EMERGENT_LLM_KEY:
-        return "تفسير غير متوفر حالياً" if language == 'ar' else "Explanation not available"
+        return explanation_unavailable(language)
+    
+    cached = await get_cached_explanation(prompt, language)
+    if cached is not None:
+        return cached
     
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message=f"You are a helpful assistant providing information about baby gender prediction and genetics. Respond in {'Arabic' if language == 'ar' else 'English'}."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        return response
+        # Coalescing key only; the answer is stored under whichever model gave it
+        return await llm_single_flight.do(
+            cache_key(prompt, language, PRIMARY_MODEL),
+            lambda: request_ai_explanation(prompt, language)
+        )
     except Exception as e:
-        logging.error(f"AI explanation error: {e}")
-        return "تفسير غير متوفر حالياً" if language == 'ar' else "Explanation not available"
+        if raise_errors:
+            raise
+        logging.error(f"AI explanation error: {e!r}")
+        return explanation_unavailable(language)
+
+# AI explanations are only stored for the owner, so they are generated in the
+# background after the response is sent
+explanation_queue = ExplanationQueue(
+    lambda prompt, language: get_ai_explanation(prompt, language, raise_errors=True),
+    max_size=int(os.getenv('EXPLANATION_QUEUE_SIZE', '1000')),
+    workers=int(os.getenv('EXPLANATION_WORKERS', '4')),
+    max_retries=int(os.getenv('EXPLANATION_MAX_RETRIES', '2'))
+)
+
+# Prediction history is buffered and written with insert_many in the background
+# Statistics are counted as records are stored (rebuilt from storage at startup)
+prediction_stats = PredictionStatistics()
+
+history_writer = HistoryWriter(
+    lambda: db.predictions,
+    batch_size=int(os.getenv('HISTORY_BATCH_SIZE', '100')),
+    flush_interval=float(os.getenv('HISTORY_FLUSH_INTERVAL', '1.0')),
+    max_pending=int(os.getenv('HISTORY_MAX_PENDING', '10000')),
+    on_written=prediction_stats.record_many
+)
+
+# Monte Carlo trait distributions run in worker processes, memoized per parent combination
+TRAIT_SIMULATION_SAMPLES = int(os.getenv('TRAIT_SIMULATION_SAMPLES', '20000'))
+TRAIT_SIMULATION_MAX_SAMPLES = int(os.getenv('TRAIT_SIMULATION_MAX_SAMPLES', '500000'))
+trait_simulator = TraitSimulator(
+    workers=int(os.getenv('TRAIT_SIMULATION_WORKERS', '2')),
+    cache_size=int(os.getenv('TRAIT_SIMULATION_CACHE_SIZE', '4096'))
+)
+
+async def save_prediction(prediction: PredictionHistory):
+    await history_writer.add(prediction.dict())
+
+async def save_prediction_with_explanation(prediction: PredictionHistory, explanation_field: str, prompt: str, language: str):
+    """Save a prediction once its AI explanation has been generated in the background"""
+    async def on_explanation(explanation: Optional[str]):
+        prediction.result[explanation_field] = explanation or explanation_unavailable(language)
+        await save_prediction(prediction)
+    
+    if not explanation_queue.submit(prompt, language, on_explanation):
+        # Queue full or stopped - keep the record without an explanation
+        await on_explanation(None)
 
 # Add your routes to the router
 @api_router.get("/")
 async def root():
     return {"message": "Baby Gender & Genetics Prediction API", "version": "1.0"}
 
-@api_router.post("/predict-gender", response_model=GenderPredictionResponse)
+# Deterministic confidence: the same family pattern always gets the same answer,
+# so each response body is serialized once and then served from memory
+GENDER_DETERMINISTIC = os.getenv('GENDER_DETERMINISTIC', 'true').lower() in ('1', 'true', 'yes')
+GENDER_RESPONSE_CACHE_SIZE = int(os.getenv('GENDER_RESPONSE_CACHE_SIZE', '4096'))
+
+# (rules version, prediction key) -> (predicted gender, confidence, JSON body),
+# least recently used first
+gender_response_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+# Gender rules: loaded from a versioned file, reloaded on change or SIGHUP
+GENDER_RULES_PATH = Path(os.getenv('GENDER_RULES_PATH', str(DEFAULT_RULES_PATH)))
+if GENDER_RULES_PATH != DEFAULT_RULES_PATH:
+    swap_rules(load_rules(GENDER_RULES_PATH))
+
+def activate_gender_rules(rules):
+    previous = swap_rules(rules)
+    # Bodies were computed with the old rules
+    gender_response_cache.clear()
+    logging.info(f"Gender rules {previous.version} -> {rules.version} ({len(rules.table)} rules)")
+
+gender_rules_watcher = RuleFileWatcher(
+    GENDER_RULES_PATH,
+    load_rules,
+    activate_gender_rules,
+    interval=float(os.getenv('GENDER_RULES_POLL_INTERVAL', '5'))
+)
+
+def cached_gender_response(wife_family: List[str], husband_family: List[str], child_number: int):
+    key = (active_rules().version, prediction_key(wife_family, husband_family, child_number))
+    entry = gender_response_cache.get(key)
+    if entry is not None:
+        gender_response_cache.move_to_end(key)
+    else:
+        result = predict_gender(wife_family, husband_family, child_number, deterministic=True)
+        # Same bytes FastAPI would produce for GenderPredictionResponse
+        body = json.dumps(
+            {"predicted_gender": result["gender"], "confidence_percentage": result["confidence"]},
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+        entry = (result["gender"], result["confidence"], body)
+        # Families of up to MAX_FAMILY_CHILDREN and any pregnancy order make the
+        # key space far larger than the cache, so the least recently used goes
+        gender_response_cache[key] = entry
+        if len(gender_response_cache) > GENDER_RESPONSE_CACHE_SIZE:
+            gender_response_cache.popitem(last=False)
+    return entry
+
+@hot_router.post("/predict-gender", response_model=GenderPredictionResponse)
 async def predict_gender_endpoint(request: GenderPredictionRequest):
     try:
-        # Extract family patterns (up to 3 children)
-        wife_family = [child.gender for child in sorted(request.wife_family_children, key=lambda x: x.order)[:3]]
-        husband_family = [child.gender for child in sorted(request.husband_family_children, key=lambda x: x.order)[:3]]
-        
-        # Use new prediction system (works with 1, 2, or 3 children)
-        result = predict_gender(wife_family, husband_family, request.current_pregnancy_order)
+        # Extract family patterns (any number of children, ordered)
+        # Lists are capped at MAX_FAMILY_CHILDREN, and clients send them in order,
+        # which sorted() handles in one linear pass
+        wife_family = [child.gender for child in sorted(request.wife_family_children, key=lambda x: x.order)]
+        husband_family = [child.gender for child in sorted(request.husband_family_children, key=lambda x: x.order)]
         
-        predicted_gender = result["gender"]
-        confidence_percentage = result["confidence"]
-        
-        # Generate explanation
-        if request.language == 'ar':
-            explanation = get_explanation_ar(wife_family, husband_family, predicted_gender, request.current_pregnancy_order)
+        # Exact rule when one exists, otherwise the longest matching prefix
+        if GENDER_DETERMINISTIC:
+            predicted_gender, confidence_percentage, body = cached_gender_response(
+                wife_family, husband_family, request.current_pregnancy_order
+            )
         else:
-            explanation = get_explanation_en(wife_family, husband_family, predicted_gender, request.current_pregnancy_order)
+            result = predict_gender(wife_family, husband_family, request.current_pregnancy_order)
+            predicted_gender = result["gender"]
+            confidence_percentage = result["confidence"]
         
         # Save to database if available (with full details for owner/designer)
         if db is not None:
-            try:
-                prediction = PredictionHistory(
-                    type="gender",
-                    data=request.dict(),
-                    result={
-                        "predicted_gender": predicted_gender,
-                        "confidence_percentage": confidence_percentage,
-                        "explanation": explanation,
-                        "wife_pattern": wife_family,
-                        "husband_pattern": husband_family,
-                        "child_number": request.current_pregnancy_order,
-                        "proprietary_info": "نظام التوقع الجديد - 52 حالة - حقوق ملكية فكرية"
-                    }
-                )
-                await db.predictions.insert_one(prediction.dict())
-            except Exception as e:
-                print(f"Warning: Failed to save to database: {e}")
+            # Explanations are only stored, never returned - render (or reuse) them only here
+            explanation = get_explanation(
+                wife_family, husband_family, predicted_gender, request.current_pregnancy_order, request.language
+            )
+            prediction = PredictionHistory(
+                type="gender",
+                data=request.dict(),
+                result={
+                    "predicted_gender": predicted_gender,
+                    "confidence_percentage": confidence_percentage,
+                    "explanation": explanation,
+                    "wife_pattern": wife_family,
+                    "husband_pattern": husband_family,
+                    "child_number": request.current_pregnancy_order,
+                    "proprietary_info": "نظام التوقع الجديد - 52 حالة - حقوق ملكية فكرية"
+                }
+            )
+            await save_prediction(prediction)
         
         # Return only percentage to user (no explanation or patterns)
+        if GENDER_DETERMINISTIC:
+            return Response(
+                content=body,
+                media_type="application/json",
+                headers={"X-Rules-Version": active_rules().version}
+            )
         return GenderPredictionResponse(
             predicted_gender=predicted_gender,
             confidence_percentage=confidence_percentage
@@ -194,49 +502,45 @@ async def predict_gender_endpoint(request: GenderPredictionRequest):
         logging.error(f"Gender prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/predict-genetic-diseases", response_model=GeneticDiseaseResponse)
-async def predict_genetic_diseases(request: GeneticDiseaseRequest):
+@api_router.get("/rules")
+async def get_rules_info():
+    """Active gender rule version (clients and caches invalidate when it changes)"""
+    rules = active_rules()
+    return {
+        "version": rules.version,
+        "rules": len(rules.table),
+        "source": rules.source,
+        "reloader": gender_rules_watcher.metrics()
+    }
+
+@api_router.post("/predict-gender/batch", response_model=GenderBatchPredictionResponse)
+async def predict_gender_batch_endpoint(request: GenderBatchPredictionRequest):
+    """Predict gender for many family histories in one call (partner clinics)"""
+    count = len(request.current_pregnancy_orders)
+    if len(request.wife_family_patterns) != count or len(request.husband_family_patterns) != count:
+        raise HTTPException(
+            status_code=400,
+            detail="current_pregnancy_orders, wife_family_patterns and husband_family_patterns must have the same length"
+        )
     try:
-        # Common genetic diseases
-        genetic_diseases_info = {
-            'thalassemia': {
-                'ar': 'الثلاسيميا (أنيميا البحر المتوسط)',
-                'en': 'Thalassemia',
-                'inheritance': 'autosomal_recessive',
-                'risk_level': 'high' if 'thalassemia' in [d.lower() for d in request.wife_family_diseases + request.husband_family_diseases] else 'low'
-            },
-            'sickle_cell': {
-                'ar': 'فقر الدم المنجلي',
-                'en': 'Sickle Cell Anemia',
-                'inheritance': 'autosomal_recessive',
-                'risk_level': 'high' if 'sickle' in ' '.join(request.wife_family_diseases + request.husband_family_diseases).lower() else 'low'
-            },
-            'hemophilia': {
-                'ar': 'الهيموفيليا (نزف الدم الوراثي)',
-                'en': 'Hemophilia',
-                'inheritance': 'x_linked',
-                'risk_level': 'high' if request.gender == 'male' and 'hemophilia' in ' '.join(request.wife_family_diseases).lower() else 'low'
-            },
-            'color_blindness': {
-                'ar': 'عمى الألوان',
-                'en': 'Color Blindness',
-                'inheritance': 'x_linked',
-                'risk_level': 'medium' if request.gender == 'male' and 'color' in ' '.join(request.wife_family_diseases + request.husband_family_diseases).lower() else 'low'
-            },
-            'cystic_fibrosis': {
-                'ar': 'التليف الكيسي',
-                'en': 'Cystic Fibrosis',
-                'inheritance': 'autosomal_recessive',
-                'risk_level': 'high' if 'fibrosis' in ' '.join(request.wife_family_diseases + request.husband_family_diseases).lower() else 'low'
-            },
-            'duchenne': {
-                'ar': 'ضمور العضلات الدوشيني',
-                'en': 'Duchenne Muscular Dystrophy',
-                'inheritance': 'x_linked',
-                'risk_level': 'high' if request.gender == 'male' and 'duchenne' in ' '.join(request.wife_family_diseases).lower() else 'low'
-            }
-        }
+        result = predict_gender_batch(
+            request.wife_family_patterns,
+            request.husband_family_patterns,
+            request.current_pregnancy_orders,
+            deterministic=GENDER_DETERMINISTIC
+        )
         
+        return GenderBatchPredictionResponse(
+            predicted_genders=result["gender"].tolist(),
+            confidence_percentages=result["confidence"].tolist()
+        )
+    except Exception as e:
+        logging.error(f"Batch gender prediction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@hot_router.post("/predict-genetic-diseases", response_model=GeneticDiseaseResponse)
+async def predict_genetic_diseases(request: GeneticDiseaseRequest):
+    try:
         # Get AI analysis
         if request.language == 'ar':
             prompt = f"""تحليل الأمراض الوراثية:
@@ -263,26 +567,14 @@ Provide:
 
 Keep the response reassuring and brief (5-6 sentences). Remind about the importance of consulting a specialist."""
         
-        detailed_explanation = await get_ai_explanation(prompt, request.language)
-        
-        # Calculate overall risk
-        all_diseases = request.wife_family_diseases + request.husband_family_diseases
-        risk_level = "low"
-        risk_percentage = 25
-        
-        if len(all_diseases) > 2:
-            risk_level = "medium"
-            risk_percentage = 55
-        if len(all_diseases) > 4:
-            risk_level = "high"
-            risk_percentage = 75
-        
-        diseases_list = []
-        for disease_key, disease_info in genetic_diseases_info.items():
-            diseases_list.append({
-                'name': disease_info['ar' if request.language == 'ar' else 'en'],
-                'risk_level': disease_info['risk_level']
-            })
+        # Overall risk from the Mendelian model over the disease catalog
+        assessment = assess_genetic_risk(
+            request.wife_family_diseases,
+            request.husband_family_diseases,
+            request.gender
+        )
+        risk_level = assessment["risk_level"]
+        risk_percentage = assessment["risk_percentage"]
         
         # Save to database (with full details for owner/designer)
         if request.language == 'ar':
@@ -291,23 +583,28 @@ Keep the response reassuring and brief (5-6 sentences). Remind about the importa
             recommendations = "It is recommended to undergo comprehensive genetic testing and consult a specialist in genetic diseases before pregnancy or in its early stages."
         
         # Save to database if available (with full details for owner/designer)
+        # The AI explanation is generated in the background before saving
         if db is not None:
-            try:
-                prediction = PredictionHistory(
-                    type="genetic",
-                    data=request.dict(),
-                    result={
-                        "risk_assessment": risk_level,
-                        "risk_percentage": risk_percentage,
-                        "diseases_info": diseases_list,
-                        "recommendations": recommendations,
-                        "detailed_explanation": detailed_explanation,
-                        "proprietary_info": "حقوق ملكية فكرية - للمصمم فقط"
-                    }
-                )
-                await db.predictions.insert_one(prediction.dict())
-            except Exception as e:
-                print(f"Warning: Failed to save to database: {e}")
+            # Per-disease probabilities from the same assessment
+            diseases_list = get_diseases_info(
+                request.wife_family_diseases,
+                request.husband_family_diseases,
+                request.gender,
+                request.language,
+                assessment=assessment
+            )
+            prediction = PredictionHistory(
+                type="genetic",
+                data=request.dict(),
+                result={
+                    "risk_assessment": risk_level,
+                    "risk_percentage": risk_percentage,
+                    "diseases_info": diseases_list,
+                    "recommendations": recommendations,
+                    "proprietary_info": "حقوق ملكية فكرية - للمصمم فقط"
+                }
+            )
+            await save_prediction_with_explanation(prediction, "detailed_explanation", prompt, request.language)
         
         # Return only percentage to user (no explanation or disease details)
         return GeneticDiseaseResponse(
@@ -318,32 +615,169 @@ Keep the response reassuring and brief (5-6 sentences). Remind about the importa
         logging.error(f"Genetic disease prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/predict-genetic-diseases/batch", response_model=GeneticBatchResponse)
+async def predict_genetic_diseases_batch(request: GeneticBatchRequest):
+    """Score many couples in one call (screening programmes)"""
+    count = len(request.genders)
+    if len(request.wife_family_diseases) != count or len(request.husband_family_diseases) != count:
+        raise HTTPException(
+            status_code=400,
+            detail="wife_family_diseases, husband_family_diseases and genders must have the same length"
+        )
+    try:
+        result = assess_genetic_risk_batch(
+            request.wife_family_diseases,
+            request.husband_family_diseases,
+            request.genders
+        )
+        
+        return GeneticBatchResponse(
+            risk_percentages=result["risk_percentage"].tolist(),
+            risk_levels=result["risk_level"].tolist()
+        )
+    except Exception as e:
+        logging.error(f"Batch genetic prediction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/diseases/resolve")
+async def resolve_disease_name(
+    q: str = Query(..., min_length=1, max_length=200),
+    language: str = "ar",
+    limit: int = Query(3, ge=1, le=10)
+):
+    """Ranked catalog conditions for a free-text disease name (for autocomplete)"""
+    return {"query": q, "matches": resolve_disease(q, language, limit)}
+
+@api_router.get("/llm-metrics")
+async def get_llm_metrics():
+    """LLM client, explanation cache and background queue metrics"""
+    return {
+        "client": llm_client.metrics(),
+        "cache": explanation_cache.stats(),
+        "single_flight": {
+            "in_flight": llm_single_flight.in_flight(),
+            "calls": llm_single_flight.calls,
+            "coalesced": llm_single_flight.coalesced
+        },
+        "explanation_queue": {
+            "pending": explanation_queue.qsize(),
+            "dropped": explanation_queue.dropped,
+            "failed": explanation_queue.failed
+        },
+        "hedging": llm_hedger.metrics() if llm_hedger is not None else None,
+        "history_writer": history_writer.metrics()
+    }
+
+# Large text fields left out of compact history pages
+HISTORY_COMPACT_EXCLUDE = (
+    "result.explanation",
+    "result.detailed_explanation",
+    "result.recommendations",
+    "result.proprietary_info",
+)
+
+def encode_history_cursor(prediction: dict) -> str:
+    timestamp = prediction["timestamp"]
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = json.dumps([timestamp, prediction["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, prediction_id = json.loads(raw)
+        return naive_utc(datetime.fromisoformat(timestamp)), str(prediction_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
 @api_router.get("/history")
-async def get_history():
-    """Get prediction history"""
+async def get_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    prediction_type: Optional[str] = Query(None, alias='type'),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    compact: bool = False
+):
+    """
+    Get prediction history, newest first
+    
+    Pages are keyset-paginated on (timestamp, id): pass the X-Next-Cursor
+    header of one page as ?cursor= to get the next one. compact=true leaves
+    out explanations and other large text fields.
+    """
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available - history feature disabled")
+    query = {}
+    if prediction_type is not None:
+        query["type"] = prediction_type
+    if since is not None or until is not None:
+        query["timestamp"] = {}
+        if since is not None:
+            query["timestamp"]["$gte"] = since
+        if until is not None:
+            query["timestamp"]["$lt"] = until
+    if cursor is not None:
+        last_timestamp, last_id = decode_history_cursor(cursor)
+        # The redundant upper bound lets the index seek straight to the page
+        query.setdefault("timestamp", {})["$lte"] = last_timestamp
+        query["$or"] = [
+            {"timestamp": {"$lt": last_timestamp}},
+            {"timestamp": last_timestamp, "id": {"$lt": last_id}}
+        ]
+    projection = {"_id": 0}
+    if compact:
+        projection.update({field: 0 for field in HISTORY_COMPACT_EXCLUDE})
     try:
-        predictions = await db.predictions.find({}, {"_id": 0}).sort("timestamp", -1).limit(50).to_list(50)
+        predictions = await db.predictions.find(query, projection).sort([("timestamp", -1), ("id", -1)]).limit(limit).to_list(limit)
+        if len(predictions) == limit:
+            response.headers["X-Next-Cursor"] = encode_history_cursor(predictions[-1])
         return predictions
     except Exception as e:
         logging.error(f"History retrieval error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/export-all-data")
-async def export_all_data():
-    """Export all predictions data - For designer/owner only"""
+async def export_all_data(
+    format: str = 'json',
+    gzip: bool = False,
+    since: Optional[datetime] = None,
+    prediction_type: Optional[str] = Query(None, alias='type')
+):
+    """
+    Export all predictions data - For designer/owner only
+    
+    Streams json (same object as before), ndjson or csv; gzip=true compresses
+    the stream. since/type select an incremental export.
+    """
     if db is None:
         raise HTTPException(status_code=503, detail="Database not available - export feature disabled")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}")
     try:
-        all_predictions = await db.predictions.find({}, {"_id": 0}).sort("timestamp", -1).to_list(None)
+        query = {}
+        if since is not None:
+            query["timestamp"] = {"$gte": since}
+        if prediction_type is not None:
+            query["type"] = prediction_type
+        cursor = db.predictions.find(query, {"_id": 0}).sort("timestamp", -1).batch_size(500)
         
-        return {
-            "total_records": len(all_predictions),
+        meta = {
             "export_date": datetime.utcnow().isoformat(),
-            "data": all_predictions,
             "note": "هذه البيانات سرية - للمصمم فقط - تحتوي على جميع التفاصيل والشروحات"
         }
+        headers = {}
+        if format != 'json':
+            headers["Content-Disposition"] = f'attachment; filename="predictions.{format}"'
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(
+            export_stream(cursor, format, compress=gzip, meta=meta),
+            media_type=EXPORT_FORMATS[format],
+            headers=headers
+        )
     except Exception as e:
         logging.error(f"Export error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -364,6 +798,15 @@ async def get_statistics():
             "note": "Database not available - statistics feature disabled"
         }
     try:
+        if prediction_stats.ready:
+            # Maintained in memory as records are stored
+            return {
+                **prediction_stats.snapshot(),
+                "database_name": db.name,
+                "collection_name": "predictions"
+            }
+        
+        # Counters not loaded yet (startup has not run) - count in storage
         total_predictions = await db.predictions.count_documents({})
         gender_predictions = await db.predictions.count_documents({"type": "gender"})
         genetic_predictions = await db.predictions.count_documents({"type": "genetic"})
@@ -376,7 +819,7 @@ async def get_statistics():
                 "genetic": genetic_predictions,
                 "traits": traits_predictions
             },
-            "database_name": "test_database",
+            "database_name": db.name,
             "collection_name": "predictions"
         }
     except Exception as e:
@@ -388,6 +831,9 @@ class TraitsRequest(BaseModel):
     father_traits: dict
     language: str = 'ar'
 
+    # Known trait keys must hold a value from their scale (missing ones use defaults)
+    _check_traits = field_validator("mother_traits", "father_traits")(validate_trait_values)
+
 class TraitsResponse(BaseModel):
     hair_color_percentage: int
     eye_color_percentage: int
@@ -396,79 +842,24 @@ class TraitsResponse(BaseModel):
     predicted_traits: dict
     # explanation stored in DB only
 
-@api_router.post("/predict-traits", response_model=TraitsResponse)
+class TraitsSimulationRequest(BaseModel):
+    mother_traits: dict
+    father_traits: dict
+    language: str = 'ar'
+
+    _check_traits = field_validator("mother_traits", "father_traits")(validate_trait_values)
+    samples: Optional[int] = Field(None, ge=100)  # default TRAIT_SIMULATION_SAMPLES
+
+@hot_router.post("/predict-traits", response_model=TraitsResponse)
 async def predict_traits(request: TraitsRequest):
     """Predict physical traits based on parents' characteristics"""
     try:
         mother = request.mother_traits
         father = request.father_traits
         
-        # Simple genetic prediction logic
-        predicted = {}
-        
-        # Hair Color (simplified genetics - dark is usually dominant)
-        hair_dominance = {'black': 4, 'brown': 3, 'red': 2, 'blonde': 1}
-        mother_hair_score = hair_dominance.get(mother.get('hairColor', 'brown'), 2)
-        father_hair_score = hair_dominance.get(father.get('hairColor', 'brown'), 2)
-        avg_hair = (mother_hair_score + father_hair_score) / 2
-        
-        if avg_hair >= 3.5:
-            predicted['hair_color'] = 'أسود' if request.language == 'ar' else 'Black'
-        elif avg_hair >= 2.5:
-            predicted['hair_color'] = 'بني' if request.language == 'ar' else 'Brown'
-        elif avg_hair >= 1.5:
-            predicted['hair_color'] = 'أحمر' if request.language == 'ar' else 'Red'
-        else:
-            predicted['hair_color'] = 'أشقر' if request.language == 'ar' else 'Blonde'
-        
-        # Eye Color (brown is dominant over green/blue)
-        eye_dominance = {'dark_brown': 5, 'light_brown': 4, 'hazel': 3, 'green': 2, 'blue': 1}
-        mother_eye_score = eye_dominance.get(mother.get('eyeColor', 'dark_brown').replace(' ', '_').lower(), 3)
-        father_eye_score = eye_dominance.get(father.get('eyeColor', 'dark_brown').replace(' ', '_').lower(), 3)
-        avg_eye = (mother_eye_score + father_eye_score) / 2
-        
-        if avg_eye >= 4.5:
-            predicted['eye_color'] = 'بني غامق' if request.language == 'ar' else 'Dark Brown'
-        elif avg_eye >= 3.5:
-            predicted['eye_color'] = 'بني فاتح' if request.language == 'ar' else 'Light Brown'
-        elif avg_eye >= 2.5:
-            predicted['eye_color'] = 'عسلي' if request.language == 'ar' else 'Hazel'
-        elif avg_eye >= 1.5:
-            predicted['eye_color'] = 'أخضر' if request.language == 'ar' else 'Green'
-        else:
-            predicted['eye_color'] = 'أزرق' if request.language == 'ar' else 'Blue'
-        
-        # Skin Tone (blend of parents)
-        skin_scale = {'very_fair': 1, 'fair': 2, 'medium': 3, 'olive': 4, 'brown': 5, 'dark': 6}
-        mother_skin_score = skin_scale.get(mother.get('skinTone', 'medium'), 3)
-        father_skin_score = skin_scale.get(father.get('skinTone', 'medium'), 3)
-        avg_skin = (mother_skin_score + father_skin_score) / 2
-        
-        if avg_skin <= 1.5:
-            predicted['skin_tone'] = 'فاتح جداً' if request.language == 'ar' else 'Very Fair'
-        elif avg_skin <= 2.5:
-            predicted['skin_tone'] = 'فاتح' if request.language == 'ar' else 'Fair'
-        elif avg_skin <= 3.5:
-            predicted['skin_tone'] = 'متوسط' if request.language == 'ar' else 'Medium'
-        elif avg_skin <= 4.5:
-            predicted['skin_tone'] = 'زيتوني' if request.language == 'ar' else 'Olive'
-        elif avg_skin <= 5.5:
-            predicted['skin_tone'] = 'بني' if request.language == 'ar' else 'Brown'
-        else:
-            predicted['skin_tone'] = 'غامق' if request.language == 'ar' else 'Dark'
-        
-        # Height (average of parents with slight variation)
-        height_scale = {'short': 1, 'average': 2, 'tall': 3}
-        mother_height_score = height_scale.get(mother.get('height', 'average'), 2)
-        father_height_score = height_scale.get(father.get('height', 'average'), 2)
-        avg_height = (mother_height_score + father_height_score) / 2
-        
-        if avg_height <= 1.5:
-            predicted['height'] = 'قصير' if request.language == 'ar' else 'Short'
-        elif avg_height <= 2.5:
-            predicted['height'] = 'متوسط' if request.language == 'ar' else 'Average'
-        else:
-            predicted['height'] = 'طويل' if request.language == 'ar' else 'Tall'
+        # Precomputed trait tables (constant-time lookup per trait)
+        traits = predict_traits_from_parents(mother, father, request.language)
+        predicted = traits["predicted"]
         
         # Generate AI explanation
         if request.language == 'ar':
@@ -514,35 +905,30 @@ async def predict_traits(request: TraitsRequest):
             )
             prompt = en_prompt
         
-        explanation = await get_ai_explanation(prompt, request.language)
-        
-        # Calculate percentages based on dominance
-        hair_percentage = int((avg_hair / 4) * 100)
-        eye_percentage = int((avg_eye / 5) * 100)
-        skin_percentage = int((avg_skin / 6) * 100)
-        height_percentage = int((avg_height / 3) * 100)
+        # Percentages based on dominance
+        hair_percentage = traits["percentages"]["hair"]
+        eye_percentage = traits["percentages"]["eye"]
+        skin_percentage = traits["percentages"]["skin"]
+        height_percentage = traits["percentages"]["height"]
         
         # Save to database if available (with full details for owner/designer)
+        # The AI explanation is generated in the background before saving
         if db is not None:
-            try:
-                prediction = PredictionHistory(
-                    type="traits",
-                    data=request.dict(),
-                    result={
-                        "predicted_traits": predicted,
-                        "percentages": {
-                            "hair": hair_percentage,
-                            "eye": eye_percentage,
-                            "skin": skin_percentage,
-                            "height": height_percentage
-                        },
-                        "explanation": explanation,
-                        "proprietary_info": "حقوق ملكية فكرية - للمصمم فقط"
-                    }
-                )
-                await db.predictions.insert_one(prediction.dict())
-            except Exception as e:
-                print(f"Warning: Failed to save to database: {e}")
+            prediction = PredictionHistory(
+                type="traits",
+                data=request.dict(),
+                result={
+                    "predicted_traits": predicted,
+                    "percentages": {
+                        "hair": hair_percentage,
+                        "eye": eye_percentage,
+                        "skin": skin_percentage,
+                        "height": height_percentage
+                    },
+                    "proprietary_info": "حقوق ملكية فكرية - للمصمم فقط"
+                }
+            )
+            await save_prediction_with_explanation(prediction, "explanation", prompt, request.language)
         
         # Return only percentages and predicted traits to user (no explanation)
         return TraitsResponse(
@@ -556,7 +942,25 @@ async def predict_traits(request: TraitsRequest):
         logging.error(f"Traits prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Include the router in the main app
+@api_router.post("/predict-traits/simulate")
+async def simulate_traits_distribution(request: TraitsSimulationRequest):
+    """Monte Carlo outcome distribution for each trait (more samples = narrower margin)"""
+    samples = request.samples or TRAIT_SIMULATION_SAMPLES
+    if samples > TRAIT_SIMULATION_MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail=f"samples must be at most {TRAIT_SIMULATION_MAX_SAMPLES}")
+    try:
+        scores = parent_scores(request.mother_traits, request.father_traits)
+        counts = await trait_simulator.simulate(scores, samples)
+        return {
+            "samples": samples,
+            "traits": summarize_simulation(counts, samples, request.language)
+        }
+    except Exception as e:
+        logging.error(f"Traits simulation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Include the routers in the main app
+app.include_router(hot_router)
 app.include_router(api_router)
 
 app.add_middleware(
@@ -565,8 +969,25 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Rules-Version"],
+)
+
+# Outermost, so oversized bodies are refused before any other work
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=MAX_REQUEST_BYTES,
+    path_limits=BATCH_REQUEST_BYTES,
 )
 
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc: RequestValidationError):
+    # The input of a too_long error is the whole oversized list - don't echo it back
+    errors = [
+        {key: value for key, value in error.items() if key != "input"} if error.get("type") == "too_long" else error
+        for error in exc.errors()
+    ]
+    return await request_validation_exception_handler(request, RequestValidationError(errors, body=exc.body))
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -574,4 +995,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# No database client to close
\ No newline at end of file
+@app.on_event("startup")
+async def start_background_workers():
+    if db is not None:
+        indexes = await ensure_indexes(db)
+        logger.info(f"Prediction indexes ready: {', '.join(indexes)}")
+        await prediction_stats.rebuild(db, exclude=HISTORY_COMPACT_EXCLUDE)
+        logger.info(f"Prediction statistics loaded: {prediction_stats.total} records")
+    rendered = await asyncio.to_thread(prerender_explanations)
+    logger.info(f"Pre-rendered {rendered} gender explanations")
+    await history_writer.start()
+    await explanation_queue.start()
+    trait_simulator.start()
+    await gender_rules_watcher.start()
+    try:
+        # Admin signal: `kill -HUP <pid>` reloads the rule file immediately
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(gender_rules_watcher.reload())
+        )
+    except (NotImplementedError, AttributeError, RuntimeError):
+        pass  # No SIGHUP (Windows) or not the main thread
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await gender_rules_watcher.stop()
+    # Drain pending explanations so their predictions are still saved
+    await explanation_queue.stop()
+    await history_writer.stop()
+    trait_simulator.stop()
+    explanation_cache.close()
+    if db is not None and hasattr(db, 'close'):
+        db.close()
\ No newline at end of file
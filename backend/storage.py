@@ -0,0 +1,325 @@
+# تخزين سجل التوقعات
+# Storage backends for prediction history
+#
+# server.py talks to storage through a small Mongo-style API:
+#   db.predictions.insert_one / insert_many / count_documents
+#   db.predictions.find(...).sort().limit().to_list(), or iterated in batches
+#   with `async for` after .batch_size()
+# MongoDB (motor) provides it natively; SQLiteDatabase implements the same
+# calls on an embedded SQLite file so single-node deployments get history
+# without an outside service.
+
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Columns that can be filtered and sorted on; everything else lives in body
+_COLUMNS = ("id", "type", "timestamp")
+_OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$ne": "!="}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS predictions ("
+    "id TEXT PRIMARY KEY, type TEXT NOT NULL, timestamp TEXT NOT NULL, body TEXT NOT NULL)"
+)
+
+# Indexes behind keyset paging (timestamp, id), type filters and export.
+# Both backends create them at startup and check they exist as declared.
+PREDICTION_INDEXES = (
+    ("idx_predictions_timestamp", (("timestamp", -1), ("id", -1))),
+    ("idx_predictions_type_timestamp", (("type", 1), ("timestamp", -1), ("id", -1))),
+)
+_INSERT = "INSERT OR REPLACE INTO predictions (id, type, timestamp, body) VALUES (?, ?, ?, ?)"
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Aware datetimes converted to UTC without tzinfo, like the stored timestamps"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _to_sql_value(value: Any) -> Any:
+    # Timestamps are compared as ISO text, so every value must be naive UTC
+    if isinstance(value, datetime):
+        return naive_utc(value).isoformat(timespec="microseconds")
+    return value
+
+
+def _compile_filter(filter: Optional[dict]) -> Tuple[str, list]:
+    """Translate a Mongo-style filter on id/type/timestamp into a WHERE clause"""
+    clauses, params = _compile_conditions(filter or {})
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def _compile_conditions(filter: dict) -> Tuple[List[str], list]:
+    clauses, params = [], []
+    for field, condition in filter.items():
+        if field == "$or":
+            alternatives = []
+            for branch in condition:
+                branch_clauses, branch_params = _compile_conditions(branch)
+                alternatives.append("(" + " AND ".join(branch_clauses or ["1"]) + ")")
+                params.extend(branch_params)
+            clauses.append("(" + " OR ".join(alternatives) + ")")
+            continue
+        if field not in _COLUMNS:
+            raise ValueError(f"Unsupported filter field: {field}")
+        if isinstance(condition, dict):
+            for operator, value in condition.items():
+                if operator == "$in":
+                    clauses.append(f"{field} IN ({', '.join('?' * len(value))})")
+                    params.extend(_to_sql_value(v) for v in value)
+                elif operator in _OPERATORS:
+                    clauses.append(f"{field} {_OPERATORS[operator]} ?")
+                    params.append(_to_sql_value(value))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+        else:
+            clauses.append(f"{field} = ?")
+            params.append(_to_sql_value(condition))
+    return clauses, params
+
+
+def _encode(document: dict) -> tuple:
+    body = {k: v for k, v in document.items() if k not in _COLUMNS and k != "_id"}
+    return (
+        str(document["id"]),
+        document["type"],
+        _to_sql_value(document["timestamp"]),
+        json.dumps(body, ensure_ascii=False, default=str),
+    )
+
+
+def _decode(row: tuple, exclude: frozenset) -> dict:
+    doc_id, doc_type, timestamp, body = row
+    document = {"id": doc_id, "type": doc_type}
+    document.update(json.loads(body))
+    document["timestamp"] = datetime.fromisoformat(timestamp)
+    for field in exclude:
+        # Dotted paths such as "result.explanation" drop nested fields
+        *parents, leaf = field.split(".")
+        target = document
+        for parent in parents:
+            target = target.get(parent)
+            if not isinstance(target, dict):
+                break
+        else:
+            target.pop(leaf, None)
+    return document
+
+
+class SQLiteCursor:
+    """Lazy query built with sort()/limit(), run by to_list() or `async for`"""
+
+    def __init__(self, collection: "SQLiteCollection", filter: Optional[dict], projection: Optional[dict]):
+        self._collection = collection
+        self._filter = filter
+        self._exclude = frozenset(k for k, v in (projection or {}).items() if not v and k != "_id")
+        self._sort: List[Tuple[str, int]] = []
+        self._limit = 0
+        self._batch_size = 500
+
+    def sort(self, key: Union[str, list], direction: int = 1) -> "SQLiteCursor":
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, _ in keys:
+            if field not in _COLUMNS:
+                raise ValueError(f"Unsupported sort field: {field}")
+        self._sort.extend(keys)
+        return self
+
+    def limit(self, count: int) -> "SQLiteCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int) -> "SQLiteCursor":
+        self._batch_size = count
+        return self
+
+    def _sql(self, length: Optional[int]) -> Tuple[str, list]:
+        where, params = _compile_filter(self._filter)
+        sql = f"SELECT id, type, timestamp, body FROM predictions{where}"
+        if self._sort:
+            sql += " ORDER BY " + ", ".join(f"{f} {'DESC' if d < 0 else 'ASC'}" for f, d in self._sort)
+        limits = [n for n in (self._limit, length) if n]
+        if limits:
+            sql += " LIMIT ?"
+            params.append(min(limits))
+        return sql, params
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        sql, params = self._sql(length)
+        rows = await self._collection._database._read(sql, params)
+        return [_decode(row, self._exclude) for row in rows]
+
+    def __aiter__(self) -> AsyncIterator[dict]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[dict]:
+        # A dedicated connection keeps one consistent snapshot while only
+        # batch_size rows are held in memory at a time
+        sql, params = self._sql(None)
+        conn = self._collection._database._connect()
+        try:
+            cursor = await asyncio.to_thread(conn.execute, sql, params)
+            while True:
+                rows = await asyncio.to_thread(cursor.fetchmany, self._batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _decode(row, self._exclude)
+        finally:
+            conn.close()
+
+
+class SQLiteCollection:
+    def __init__(self, database: "SQLiteDatabase"):
+        self._database = database
+
+    async def insert_one(self, document: dict):
+        await self._database._write(_insert_many, [_encode(document)])
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True):
+        await self._database._write(_insert_many, [_encode(d) for d in documents])
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None) -> SQLiteCursor:
+        return SQLiteCursor(self, filter, projection)
+
+    async def count_documents(self, filter: Optional[dict] = None) -> int:
+        where, params = _compile_filter(filter)
+        rows = await self._database._read(f"SELECT COUNT(*) FROM predictions{where}", params)
+        return rows[0][0]
+
+
+def _create_indexes(conn: sqlite3.Connection) -> List[str]:
+    # SQLite walks an index in either direction, so only the columns matter
+    for name, keys in PREDICTION_INDEXES:
+        columns = [field for field, _ in keys]
+        existing = [row[2] for row in conn.execute(f"PRAGMA index_info({name})")]
+        if existing == columns:
+            continue
+        if existing:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(f"CREATE INDEX {name} ON predictions ({', '.join(columns)})")
+    return [name for name, _ in PREDICTION_INDEXES]
+
+
+def _insert_many(conn: sqlite3.Connection, rows: List[tuple]):
+    conn.executemany(_INSERT, rows)
+
+
+class SQLiteDatabase:
+    """
+    Embedded SQLite storage in WAL mode.
+
+    All writes go through one dedicated writer thread (SQLite allows a single
+    writer); reads run on worker threads with their own connections, which WAL
+    lets proceed alongside the writer.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self._local = threading.local()
+        self._writes: "queue.Queue" = queue.Queue()
+        writer = self._connect()
+        writer.execute(_SCHEMA)
+        _create_indexes(writer)
+        writer.commit()
+        self._writer = threading.Thread(target=self._write_loop, args=(writer,), name="sqlite-writer", daemon=True)
+        self._writer.start()
+        self.predictions = SQLiteCollection(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    async def ensure_indexes(self) -> List[str]:
+        """Create any missing or changed index and return the index names"""
+        return await self._write(_create_indexes)
+
+    def close(self):
+        self._writes.put(None)
+        self._writer.join()
+
+    async def _write(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writes.put((fn, args, loop, future))
+        return await future
+
+    def _write_loop(self, conn: sqlite3.Connection):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            fn, args, loop, future = item
+            try:
+                with conn:
+                    result = fn(conn, *args)
+            except Exception as e:
+                loop.call_soon_threadsafe(_resolve, future, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, future, result, None)
+        conn.close()
+
+    async def _read(self, sql: str, params: list) -> list:
+        return await asyncio.to_thread(self._read_sync, sql, params)
+
+    def _read_sync(self, sql: str, params: list) -> list:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn.execute(sql, params).fetchall()
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+async def ensure_indexes(db) -> List[str]:
+    """Create the history indexes at startup and verify they are in place"""
+    if isinstance(db, SQLiteDatabase):
+        return await db.ensure_indexes()
+    for name, keys in PREDICTION_INDEXES:
+        await db.predictions.create_index(list(keys), name=name)
+    existing = await db.predictions.index_information()
+    missing = [name for name, _ in PREDICTION_INDEXES if name not in existing]
+    if missing:
+        raise RuntimeError(f"Missing prediction indexes: {', '.join(missing)}")
+    return [name for name, _ in PREDICTION_INDEXES]
+
+
+def open_database(backend: str, **options) -> Optional[Any]:
+    """
+    Open the configured storage backend.
+
+    "none" disables history, "sqlite" uses an embedded file (option: path),
+    "mongo" uses MongoDB through motor (options: mongo_url, db_name).
+    """
+    if backend in ("", "none"):
+        return None
+    if backend == "sqlite":
+        return SQLiteDatabase(options["path"])
+    if backend == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(options["mongo_url"])
+        return client[options["db_name"]]
+    raise ValueError(f"Unknown storage backend: {backend}")
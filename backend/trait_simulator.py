@@ -0,0 +1,81 @@
+# تشغيل محاكاة الصفات في عمليات منفصلة
+# Process-pool runner for the Monte Carlo trait simulation
+#
+# Simulations are CPU-bound NumPy work, so they run in worker processes and
+# the event loop only awaits the result. Results depend only on the parents'
+# scores and the sample count (the seed is derived from them), so they are
+# memoized per combination and identical concurrent requests share one run.
+
+import asyncio
+import multiprocessing
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from single_flight import SingleFlight
+from traits_prediction_logic import simulate_traits
+
+
+class TraitSimulator:
+    def __init__(self, workers: int = 2, cache_size: int = 4096):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def simulate(self, scores: tuple, samples: int) -> dict:
+        """Label counts per trait for parent scores from parent_scores()"""
+        key = (scores, samples)
+        counts = self._cache.get(key)
+        if counts is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return counts
+        self.misses += 1
+        return await self._single_flight.do(key, lambda: self._run(key))
+
+    async def _run(self, key: tuple) -> dict:
+        scores, samples = key
+        seed = zlib.crc32(repr(key).encode())
+        if self._executor is None:
+            # Not started (no lifecycle events) - keep it off the event loop anyway
+            counts = await asyncio.to_thread(simulate_traits, scores, samples, seed)
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                counts = await loop.run_in_executor(self._executor, simulate_traits, scores, samples, seed)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); replace the pool for later calls
+                self.stop()
+                self.start()
+                raise
+        self._cache[key] = counts
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return counts
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers if self._executor is not None else 0,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "in_flight": self._single_flight.in_flight(),
+        }
@@ -0,0 +1,235 @@
+# نظام توقع الصفات الوراثية للطفل
+# Physical Traits Prediction Based on Parents' Characteristics
+#
+# Each trait maps a parent's value to a dominance score. The child's label and
+# percentage depend only on the two parents' scores, so every combination is
+# computed once at import and a request is a constant-time table lookup.
+
+import math
+
+import numpy as np
+
+# كتالوج الصفات
+# Trait catalog: request key, default value, score for unknown values,
+# dominance scale, and labels chosen from the parents' average score.
+# "compare" is ">=" when labels are listed from the highest threshold down,
+# "<=" when listed from the lowest up; the last label has no threshold.
+TRAIT_CATALOG = {
+    "hair_color": {
+        "input": "hairColor",
+        "default": "brown",
+        "unknown_score": 2,
+        "normalize": False,
+        "scale": {"black": 4, "brown": 3, "red": 2, "blonde": 1},
+        "compare": ">=",
+        "labels": [
+            (3.5, "Black", "أسود"),
+            (2.5, "Brown", "بني"),
+            (1.5, "Red", "أحمر"),
+            (None, "Blonde", "أشقر"),
+        ],
+    },
+    "eye_color": {
+        "input": "eyeColor",
+        "default": "dark_brown",
+        "unknown_score": 3,
+        "normalize": True,
+        "scale": {"dark_brown": 5, "light_brown": 4, "hazel": 3, "green": 2, "blue": 1},
+        "compare": ">=",
+        "labels": [
+            (4.5, "Dark Brown", "بني غامق"),
+            (3.5, "Light Brown", "بني فاتح"),
+            (2.5, "Hazel", "عسلي"),
+            (1.5, "Green", "أخضر"),
+            (None, "Blue", "أزرق"),
+        ],
+    },
+    "skin_tone": {
+        "input": "skinTone",
+        "default": "medium",
+        "unknown_score": 3,
+        "normalize": False,
+        "scale": {"very_fair": 1, "fair": 2, "medium": 3, "olive": 4, "brown": 5, "dark": 6},
+        "compare": "<=",
+        "labels": [
+            (1.5, "Very Fair", "فاتح جداً"),
+            (2.5, "Fair", "فاتح"),
+            (3.5, "Medium", "متوسط"),
+            (4.5, "Olive", "زيتوني"),
+            (5.5, "Brown", "بني"),
+            (None, "Dark", "غامق"),
+        ],
+    },
+    "height": {
+        "input": "height",
+        "default": "average",
+        "unknown_score": 2,
+        "normalize": False,
+        "scale": {"short": 1, "average": 2, "tall": 3},
+        "compare": "<=",
+        "labels": [
+            (1.5, "Short", "قصير"),
+            (2.5, "Average", "متوسط"),
+            (None, "Tall", "طويل"),
+        ],
+    },
+}
+
+# Response percentage keys for each trait
+PERCENTAGE_KEYS = {"hair_color": "hair", "eye_color": "eye", "skin_tone": "skin", "height": "height"}
+
+
+def _classify(trait, average):
+    """Index of the label for an average score"""
+    labels = trait["labels"]
+    for index, (threshold, _, _) in enumerate(labels[:-1]):
+        if trait["compare"] == ">=" and average >= threshold:
+            return index
+        if trait["compare"] == "<=" and average <= threshold:
+            return index
+    return len(labels) - 1
+
+
+def _compile_trait(trait):
+    """Precompute (label index, percentage) for every pair of parent scores"""
+    max_score = max(trait["scale"].values())
+    table = []
+    for mother_score in range(1, max_score + 1):
+        for father_score in range(1, max_score + 1):
+            average = (mother_score + father_score) / 2
+            table.append((_classify(trait, average), int((average / max_score) * 100)))
+    return max_score, tuple(table)
+
+
+# Compiled tables: trait -> (max score, ((label index, percentage), ...))
+COMPILED_TRAITS = {name: _compile_trait(trait) for name, trait in TRAIT_CATALOG.items()}
+
+# Localized labels: language -> trait -> labels by index
+TRAIT_LABELS = {
+    "en": {name: tuple(label[1] for label in trait["labels"]) for name, trait in TRAIT_CATALOG.items()},
+    "ar": {name: tuple(label[2] for label in trait["labels"]) for name, trait in TRAIT_CATALOG.items()},
+}
+
+
+def trait_score(trait_name, parent_traits):
+    """Dominance score of one parent's trait value"""
+    trait = TRAIT_CATALOG[trait_name]
+    value = parent_traits.get(trait["input"], trait["default"])
+    if trait["normalize"]:
+        value = value.replace(' ', '_').lower()
+    return trait["scale"].get(value, trait["unknown_score"])
+
+
+def validate_trait_values(parent_traits):
+    """Raise ValueError unless every known trait given has a value from its scale"""
+    for name, trait in TRAIT_CATALOG.items():
+        if trait["input"] not in parent_traits:
+            continue  # missing traits use the default; an explicit null is rejected below
+        value = parent_traits[trait["input"]]
+        if isinstance(value, str) and trait["normalize"]:
+            value = value.replace(' ', '_').lower()
+        if not isinstance(value, str) or value not in trait["scale"]:
+            raise ValueError(f"{trait['input']} must be one of: {', '.join(trait['scale'])}")
+    return parent_traits
+
+
+def predict_traits(mother_traits, father_traits, language='ar'):
+    """
+    توقع صفات الطفل بناءً على صفات الوالدين
+
+    Returns:
+        dict: {"predicted": {trait: localized label},
+               "percentages": {"hair"/"eye"/"skin"/"height": int}}
+    """
+    labels = TRAIT_LABELS["ar" if language == 'ar' else "en"]
+    predicted = {}
+    percentages = {}
+    for name, (max_score, table) in COMPILED_TRAITS.items():
+        mother_score = trait_score(name, mother_traits)
+        father_score = trait_score(name, father_traits)
+        label_index, percentage = table[(mother_score - 1) * max_score + (father_score - 1)]
+        predicted[name] = labels[name][label_index]
+        percentages[PERCENTAGE_KEYS[name]] = percentage
+    return {"predicted": predicted, "percentages": percentages}
+
+
+# محاكاة مونت كارلو لتوزيع الصفات
+# Monte Carlo outcome distribution
+#
+# Each trait is modelled as polygenic with (max score - 1) additive loci. A
+# parent with score s carries 2 * (s - 1) "plus" alleles, spread over the loci
+# heterozygous first, and passes one allele per locus to the child. The
+# child's score is 1 + (plus alleles received) / 2, so its mean equals the
+# parents' average used by predict_traits, and each sample is labelled with
+# the same thresholds.
+
+# Child plus-allele count -> label index, for every trait
+SIMULATION_LABELS = {
+    name: np.array([_classify(TRAIT_CATALOG[name], 1 + plus / 2) for plus in range(2 * max_score - 1)])
+    for name, (max_score, _) in COMPILED_TRAITS.items()
+}
+
+
+def _transmission(score, max_score):
+    """(plus alleles always passed on, heterozygous loci) for a parent score"""
+    loci = max_score - 1
+    plus = 2 * (score - 1)
+    heterozygous = min(plus, loci) if plus <= loci else 2 * loci - plus
+    homozygous = (plus - heterozygous) // 2
+    return homozygous, heterozygous
+
+
+def parent_scores(mother_traits, father_traits):
+    """((trait, mother score, father score), ...) - the simulation's whole input"""
+    return tuple(
+        (name, trait_score(name, mother_traits), trait_score(name, father_traits))
+        for name in TRAIT_CATALOG
+    )
+
+
+def simulate_traits(scores, samples, seed=None):
+    """
+    Sample `samples` children for parent scores from parent_scores().
+
+    Pure and picklable so it can run in a worker process.
+
+    Returns:
+        dict: {trait: [count per label index]}
+    """
+    rng = np.random.default_rng(seed)
+    counts = {}
+    for name, mother_score, father_score in scores:
+        max_score = COMPILED_TRAITS[name][0]
+        mother_fixed, mother_segregating = _transmission(mother_score, max_score)
+        father_fixed, father_segregating = _transmission(father_score, max_score)
+        # Each heterozygous locus passes on its plus allele with probability 1/2
+        plus = mother_fixed + father_fixed + rng.binomial(mother_segregating + father_segregating, 0.5, size=samples)
+        labels = SIMULATION_LABELS[name]
+        counts[name] = np.bincount(labels[plus], minlength=len(TRAIT_CATALOG[name]["labels"])).tolist()
+    return counts
+
+
+def summarize_simulation(counts, samples, language='ar'):
+    """
+    Localized distribution per trait.
+
+    Returns:
+        dict: {trait: {"predicted": label, "confidence": share of the most
+               likely label (%), "margin": 95% half-width (%),
+               "distribution": {label: %}}}
+    """
+    labels = TRAIT_LABELS["ar" if language == 'ar' else "en"]
+    summary = {}
+    for name, trait_counts in counts.items():
+        best = max(range(len(trait_counts)), key=trait_counts.__getitem__)
+        share = trait_counts[best] / samples
+        summary[name] = {
+            "predicted": labels[name][best],
+            "confidence": round(share * 100, 2),
+            "margin": round(1.96 * math.sqrt(share * (1 - share) / samples) * 100, 2),
+            "distribution": {
+                labels[name][index]: round(count / samples * 100, 2)
+                for index, count in enumerate(trait_counts) if count
+            },
+        }
+    return summary
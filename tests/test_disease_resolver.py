@@ -0,0 +1,48 @@
+import pytest
+
+from genetic_prediction_logic import DISEASE_RESOLVER, assess_genetic_risk
+
+# Generic conditions that share a word with a catalog disease but are not it
+GENERIC_NAMES = [
+    "iron deficiency",
+    "vitamin d deficiency",
+    "deficiency",
+    "iron deficiency anemia",
+    "aplastic anemia",
+    "anemia",
+    "muscular",
+    "myotonic dystrophy",
+    "فقر الدم",
+    "فقر دم",
+    "نقص الحديد",
+    "مرض وراثي",
+]
+
+
+@pytest.mark.parametrize("name", GENERIC_NAMES)
+def test_generic_names_do_not_resolve(name):
+    assert DISEASE_RESOLVER.resolve(name) == []
+    assert DISEASE_RESOLVER.match([name]) == set()
+
+
+@pytest.mark.parametrize("name, key", [
+    ("thalasemia", "thalassemia"),
+    ("sickel cell", "sickle_cell"),
+    ("sickle cell anemia", "sickle_cell"),
+    ("father had sickle cell", "sickle_cell"),
+    ("فقر دم منجلي", "sickle_cell"),
+    ("hemophelia", "hemophilia"),
+    ("duchene muscular dystrophy", "duchenne"),
+    ("muscular dystrophy", "duchenne"),
+    ("g6pd deficency", "g6pd_deficiency"),
+    ("أنيميا الفول", "g6pd_deficiency"),
+    ("colour blindnes", "color_blindness"),
+])
+def test_misspellings_and_aliases_resolve(name, key):
+    assert DISEASE_RESOLVER.match([name]) == {key}
+
+
+def test_generic_names_leave_risk_low():
+    assert assess_genetic_risk(["iron deficiency"], [], "male")["risk_level"] == "low"
+    assert assess_genetic_risk(["فقر الدم"], ["فقر الدم"], "male")["risk_level"] == "low"
+    assert assess_genetic_risk(["muscular"], [], "male")["risk_level"] == "low"
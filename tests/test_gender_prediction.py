@@ -0,0 +1,96 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from gender_prediction_logic import lookup_prediction, predict_gender, predict_gender_batch
+
+# Every family of up to 4 children, with an Arabic spelling mixed in
+FAMILIES = [list(p) for size in range(5) for p in itertools.product(("male", "female", "ذكر"), repeat=size)]
+
+
+def sample_rows(count, step=7):
+    """Deterministic spread of (wife, husband, child number) rows"""
+    return [
+        (FAMILIES[i % len(FAMILIES)], FAMILIES[(i * step) % len(FAMILIES)], 1 + i % 4)
+        for i in range(count)
+    ]
+
+
+def test_deterministic_batch_matches_single_predictions():
+    rows = sample_rows(3000)
+    batch = predict_gender_batch(*zip(*rows), deterministic=True)
+    for row, (wife, husband, child_number) in enumerate(rows):
+        single = predict_gender(wife, husband, child_number, deterministic=True)
+        assert (batch["gender"][row], batch["confidence"][row]) == (single["gender"], single["confidence"])
+
+
+def test_deterministic_batch_matches_single_for_unkeyed_rows():
+    # Unknown values and families too long for an exact key are drawn per row
+    rows = [
+        (["male", "unknown"], ["female", "male"], 1),
+        (["male", "female"] * 40, ["female"] * 80, 2),
+        (["Male"] * 62, ["ذكر"] * 62, 3),
+        (["male"], ["female", "male", "female"], 4),
+    ] * 3
+    batch = predict_gender_batch(*zip(*rows), deterministic=True)
+    for row, (wife, husband, child_number) in enumerate(rows):
+        single = predict_gender(wife, husband, child_number, deterministic=True)
+        assert (batch["gender"][row], batch["confidence"][row]) == (single["gender"], single["confidence"])
+
+
+def test_deterministic_batch_is_repeatable():
+    rows = sample_rows(500)
+    first = predict_gender_batch(*zip(*rows), deterministic=True)
+    second = predict_gender_batch(*zip(*rows), deterministic=True)
+    assert first["confidence"].tolist() == second["confidence"].tolist()
+    assert first["gender"].tolist() == second["gender"].tolist()
+
+
+def test_batch_genders_match_lookup_prediction():
+    # Unequal lengths, unknown values and long families take the trie fallback
+    odd_rows = [
+        (["Male", "female"], ["male"], 1),
+        (["male", "unknown"], ["female", "male"], 2),
+        (["female"] * 5, ["male"] * 5, 1),
+        (["ذكر", "أنثى", "male"], ["female", "male", "أنثى"], 2),
+        ([], [], 1),
+    ]
+    rows = sample_rows(3000, step=11) + odd_rows
+    batch = predict_gender_batch(*zip(*rows), rng=np.random.default_rng(0))
+    for row, (wife, husband, child_number) in enumerate(rows):
+        prediction = lookup_prediction(wife, husband)
+        assert batch["found"][row] == (prediction is not None)
+        if prediction is None:
+            assert batch["gender"][row] == "male"
+        elif child_number <= 2:
+            assert batch["gender"][row] == prediction[child_number - 1]
+
+
+def test_gender_response_is_not_marked_cacheable():
+    # POST responses are not reused by HTTP caches, and rules can be reloaded at any time
+    testclient = pytest.importorskip("fastapi.testclient")
+    import server
+
+    response = testclient.TestClient(server.app).post("/api/predict-gender", json={
+        "current_pregnancy_order": 1,
+        "wife_family_children": [{"order": 1, "gender": "male"}],
+        "husband_family_children": [{"order": 1, "gender": "female"}],
+    })
+    assert response.status_code == 200
+    assert "cache-control" not in response.headers
+    assert response.headers["x-rules-version"] == server.active_rules().version
+
+
+def test_gender_response_cache_evicts_least_recently_used(monkeypatch):
+    pytest.importorskip("fastapi")
+    import server
+
+    monkeypatch.setattr(server, "GENDER_RESPONSE_CACHE_SIZE", 3)
+    monkeypatch.setattr(server, "gender_response_cache", server.OrderedDict())
+    for order in (1, 2, 3):
+        server.cached_gender_response(["male"], ["female"], order)
+    server.cached_gender_response(["male"], ["female"], 1)  # now most recently used
+    server.cached_gender_response(["male"], ["female"], 4)
+    orders = [key[1][2] for key in server.gender_response_cache]
+    assert orders == [3, 1, 4]
@@ -0,0 +1,41 @@
+import pytest
+
+from genetic_prediction_logic import assess_genetic_risk, assess_genetic_risk_batch
+
+
+def test_carrier_by_carrier_recessive_is_high():
+    # Both families affected: each parent a 50% carrier, child affected 1/2 * 1/2 * 1/4
+    result = assess_genetic_risk(["thalassemia"], ["thalassemia"], "male")
+    probability, level = result["diseases"]["thalassemia"]
+    assert probability == pytest.approx(0.0625)
+    assert level == "high"
+    assert result["risk_level"] == "high"
+
+
+def test_one_sided_recessive_history_is_medium():
+    result = assess_genetic_risk(["thalassemia"], [], "female")
+    assert result["diseases"]["thalassemia"][1] == "medium"
+
+
+def test_x_linked_son_of_carrier_is_high_and_daughter_low():
+    son = assess_genetic_risk(["hemophilia"], [], "male")
+    daughter = assess_genetic_risk(["hemophilia"], [], "female")
+    assert son["diseases"]["hemophilia"] == (pytest.approx(0.25), "high")
+    assert daughter["diseases"]["hemophilia"][1] == "low"
+
+
+def test_no_family_history_is_low():
+    assert assess_genetic_risk([], [], "female")["risk_level"] == "low"
+
+
+def test_batch_matches_single_couples():
+    couples = [
+        (["thalassemia"], ["thalassemia"], "male"),
+        (["hemophilia"], [], "unknown"),
+        ([], ["sickle cell"], "female"),
+    ]
+    batch = assess_genetic_risk_batch(*zip(*couples))
+    for row, couple in enumerate(couples):
+        single = assess_genetic_risk(*couple)
+        assert batch["risk_level"][row] == single["risk_level"]
+        assert batch["risk_percentage"][row] == single["risk_percentage"]
@@ -0,0 +1,123 @@
+import asyncio
+
+from history_writer import HistoryWriter
+
+
+class FakeCollection:
+    """Records insert batches; each write can be made slow"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def insert_one(self, document):
+        await asyncio.sleep(self.delay)
+        self.batches.append([document])
+
+    async def insert_many(self, documents, ordered=True):
+        await asyncio.sleep(self.delay)
+        self.batches.append(list(documents))
+
+
+def make_writer(collection, written, **options):
+    return HistoryWriter(lambda: collection, on_written=written.extend, **options)
+
+
+def test_documents_are_written_in_batches():
+    async def scenario():
+        collection, written = FakeCollection(), []
+        writer = make_writer(collection, written, batch_size=10, flush_interval=5)
+        await writer.start()
+        for index in range(25):
+            await writer.add({"id": index})
+        await asyncio.sleep(0.05)
+        # Two full batches go out at once; the rest waits for the interval
+        assert [len(batch) for batch in collection.batches] == [10, 10]
+        await writer.stop()
+        assert [len(batch) for batch in collection.batches] == [10, 10, 5]
+        assert [document["id"] for document in written] == list(range(25))
+        assert writer.metrics()["written"] == 25
+
+    asyncio.run(scenario())
+
+
+def test_partial_batch_is_flushed_after_interval():
+    async def scenario():
+        collection, written = FakeCollection(), []
+        writer = make_writer(collection, written, batch_size=100, flush_interval=0.05)
+        await writer.start()
+        for index in range(3):
+            await writer.add({"id": index})
+        await asyncio.sleep(0.2)
+        assert [len(batch) for batch in collection.batches] == [3]
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_full_buffer_applies_backpressure_then_drops():
+    async def scenario():
+        collection, written = FakeCollection(delay=0.5), []
+        writer = make_writer(collection, written, batch_size=1, flush_interval=0.01, max_pending=2, put_timeout=0.05)
+        await writer.start()
+        for index in range(6):
+            await writer.add({"id": index})
+        metrics = writer.metrics()
+        assert metrics["dropped"] >= 1
+        assert metrics["pending"] <= 2
+        await writer.stop()
+        # Everything not dropped is stored
+        assert writer.metrics()["written"] + writer.metrics()["dropped"] == 6
+
+    asyncio.run(scenario())
+
+
+def test_stop_during_write_keeps_the_batch_and_counts_it():
+    async def scenario():
+        collection, written = FakeCollection(delay=0.2), []
+        writer = make_writer(collection, written, batch_size=5, flush_interval=5)
+        await writer.start()
+        for index in range(12):
+            await writer.add({"id": index})
+        await asyncio.sleep(0.05)  # first batch is being written
+        await writer.stop()
+        assert sorted(document["id"] for document in written) == list(range(12))
+        assert sum(len(batch) for batch in collection.batches) == 12
+        assert not writer.running
+
+    asyncio.run(scenario())
+
+
+def test_add_after_stop_writes_directly():
+    async def scenario():
+        collection, written = FakeCollection(), []
+        writer = make_writer(collection, written)
+        await writer.start()
+        await writer.stop()
+        await writer.add({"id": 1})
+        assert collection.batches == [[{"id": 1}]]
+
+    asyncio.run(scenario())
+
+
+class FailingCollection(FakeCollection):
+    async def insert_many(self, documents, ordered=True):
+        raise RuntimeError("database down")
+
+
+def test_failed_write_is_logged_and_counted(caplog):
+    async def scenario():
+        collection, written = FailingCollection(), []
+        writer = make_writer(collection, written, batch_size=3, flush_interval=5)
+        await writer.start()
+        for index in range(3):
+            await writer.add({"id": index})
+        await writer.stop()
+        assert writer.metrics()["failed"] == 3
+        assert written == []
+
+    with caplog.at_level("ERROR", logger="history_writer"):
+        asyncio.run(scenario())
+    [record] = caplog.records
+    assert "3 prediction record(s)" in record.getMessage()
+    assert record.exc_info[1].args == ("database down",)
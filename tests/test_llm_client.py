@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from llm_client import CircuitBreaker, CircuitOpenError, LlmClientManager
+
+
+class FlakyProvider:
+    """Fails while `failing` is set, answers otherwise"""
+
+    def __init__(self, failing=True, delay=0.0):
+        self.failing = failing
+        self.delay = delay
+        self.calls = 0
+
+    async def send(self, prompt, language):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.failing:
+            raise RuntimeError("provider down")
+        return f"answer: {prompt}"
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_one_trial_then_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_released_trial_lets_the_next_call_try():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
+
+
+def test_manager_rejects_while_open_and_recovers():
+    async def scenario():
+        provider = FlakyProvider()
+        client = LlmClientManager(provider.send, failure_threshold=2, reset_timeout=0.05)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await client.call("hi", "en")
+        with pytest.raises(CircuitOpenError):
+            await client.call("hi", "en")
+        assert provider.calls == 2
+        assert client.rejected == 1
+
+        provider.failing = False
+        await asyncio.sleep(0.06)
+        assert await client.call("hi", "en") == "answer: hi"
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_manager_timeout_counts_as_failure():
+    async def scenario():
+        provider = FlakyProvider(failing=False, delay=1)
+        client = LlmClientManager(provider.send, timeout=0.02, failure_threshold=1, reset_timeout=60)
+        with pytest.raises(asyncio.TimeoutError):
+            await client.call("hi", "en")
+        assert client.timeouts == 1
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from llm_hedging import HedgedSender
+
+
+class FakeProvider:
+    """Answers after a fixed delay, or fails"""
+
+    def __init__(self, name, delay, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def send(self, prompt, language):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"{self.name}: {prompt}"
+
+
+def make_sender(primary, alternate, **options):
+    options.setdefault("default_delay", 0.05)
+    return HedgedSender(primary.name, primary.send, alternate.name, alternate.send, **options)
+
+
+def test_fast_primary_is_not_hedged():
+    async def scenario():
+        primary, alternate = FakeProvider("primary", 0.01), FakeProvider("alternate", 0.01)
+        sender = make_sender(primary, alternate)
+        assert await sender.send_with_provider("hi", "en") == ("primary", "primary: hi")
+        assert alternate.calls == 0
+        assert sender.hedges == 0
+
+    asyncio.run(scenario())
+
+
+def test_slow_primary_triggers_hedge_and_alternate_wins():
+    async def scenario():
+        primary, alternate = FakeProvider("primary", 1.0), FakeProvider("alternate", 0.01)
+        sender = make_sender(primary, alternate)
+        assert await sender.send_with_provider("hi", "en") == ("alternate", "alternate: hi")
+        await asyncio.sleep(0)  # let the cancelled primary unwind
+        assert sender.hedges == 1
+        metrics = sender.metrics()["providers"]
+        assert metrics["alternate"]["wins"] == 1
+        assert metrics["primary"]["cancelled"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_call_records_elapsed_time_as_lower_bound():
+    async def scenario():
+        primary, alternate = FakeProvider("primary", 1.0), FakeProvider("alternate", 0.01)
+        sender = make_sender(primary, alternate)
+        await sender.send("hi", "en")
+        await asyncio.sleep(0)
+        latencies = list(sender.providers[0][0].latencies)
+        # Cancelled after the hedge delay plus the alternate's answer
+        assert len(latencies) == 1
+        assert 0.05 <= latencies[0] < 1.0
+
+    asyncio.run(scenario())
+
+
+def test_failed_primary_hedges_at_once():
+    async def scenario():
+        primary = FakeProvider("primary", 0.0, error=RuntimeError("down"))
+        alternate = FakeProvider("alternate", 0.01)
+        sender = make_sender(primary, alternate, default_delay=5)
+        assert await asyncio.wait_for(sender.send("hi", "en"), 1) == "alternate: hi"
+        assert sender.providers[0][0].failures == 1
+
+    asyncio.run(scenario())
+
+
+def test_both_failing_raises_last_error():
+    async def scenario():
+        primary = FakeProvider("primary", 0.1, error=RuntimeError("primary down"))
+        alternate = FakeProvider("alternate", 0.2, error=RuntimeError("alternate down"))
+        sender = make_sender(primary, alternate)
+        with pytest.raises(RuntimeError, match="alternate down"):
+            await sender.send("hi", "en")
+
+    asyncio.run(scenario())
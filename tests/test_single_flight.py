@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class CountingCall:
+    """Upstream stand-in that counts calls and can fail"""
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"result {self.calls}"
+
+
+def test_concurrent_calls_with_same_key_share_one_call():
+    async def scenario():
+        flight, upstream = SingleFlight(), CountingCall()
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(10)))
+        assert results == ["result 1"] * 10
+        assert upstream.calls == 1
+        assert (flight.calls, flight.coalesced) == (1, 9)
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_are_not_coalesced():
+    async def scenario():
+        flight, upstream = SingleFlight(), CountingCall()
+        await asyncio.gather(flight.do("a", upstream), flight.do("b", upstream))
+        assert upstream.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_finished_call_is_not_reused():
+    async def scenario():
+        flight, upstream = SingleFlight(), CountingCall(delay=0)
+        assert await flight.do("key", upstream) == "result 1"
+        assert await flight.do("key", upstream) == "result 2"
+
+    asyncio.run(scenario())
+
+
+def test_error_is_delivered_to_every_waiter():
+    async def scenario():
+        flight, upstream = SingleFlight(), CountingCall(error=RuntimeError("upstream down"))
+        results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(5)), return_exceptions=True)
+        assert upstream.calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        # The failure is not cached: the next call goes upstream again
+        with pytest.raises(RuntimeError):
+            await flight.do("key", upstream)
+        assert upstream.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_keeps_the_shared_call():
+    async def scenario():
+        flight, upstream = SingleFlight(), CountingCall(delay=0.1)
+        first = asyncio.ensure_future(flight.do("key", upstream))
+        second = asyncio.ensure_future(flight.do("key", upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "result 1"
+        assert first.cancelled()
+        assert upstream.cancelled == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_last_waiter_cancels_the_call():
+    async def scenario():
+        flight, upstream = SingleFlight(), CountingCall(delay=1)
+        waiter = asyncio.ensure_future(flight.do("key", upstream))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert upstream.cancelled == 1
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from storage import SQLiteDatabase, _compile_filter
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_documents(count):
+    # Every timestamp is shared by three documents so paging has to break ties on id
+    return [
+        {
+            "id": f"pred-{index:03d}",
+            "type": ("gender", "traits", "genetic")[index % 3],
+            "timestamp": START + timedelta(seconds=index // 3),
+            "result": {"explanation": f"text {index}", "score": index},
+        }
+        for index in range(count)
+    ]
+
+
+def keyset_query(last, prediction_type=None):
+    """The /api/history filter for the page after `last`"""
+    query = {} if prediction_type is None else {"type": prediction_type}
+    if last is not None:
+        query["timestamp"] = {"$lte": last["timestamp"]}
+        query["$or"] = [
+            {"timestamp": {"$lt": last["timestamp"]}},
+            {"timestamp": last["timestamp"], "id": {"$lt": last["id"]}},
+        ]
+    return query
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SQLiteDatabase(tmp_path / "history.db")
+    yield database
+    database.close()
+
+
+def test_compile_filter_plain_and_operators():
+    where, params = _compile_filter({"type": "gender", "timestamp": {"$gte": START, "$lt": "2025"}})
+    assert where == " WHERE type = ? AND timestamp >= ? AND timestamp < ?"
+    assert params == ["gender", START.isoformat(timespec="microseconds"), "2025"]
+    assert _compile_filter(None) == ("", [])
+
+
+def test_compile_filter_in_and_or():
+    where, params = _compile_filter({
+        "type": {"$in": ["gender", "traits"]},
+        "$or": [{"timestamp": {"$lt": "b"}}, {"timestamp": "b", "id": {"$lt": "x"}}],
+    })
+    assert where == " WHERE type IN (?, ?) AND ((timestamp < ?) OR (timestamp = ? AND id < ?))"
+    assert params == ["gender", "traits", "b", "b", "x"]
+
+
+def test_compile_filter_rejects_unknown_fields_and_operators():
+    with pytest.raises(ValueError):
+        _compile_filter({"result": 1})
+    with pytest.raises(ValueError):
+        _compile_filter({"type": {"$regex": "g"}})
+
+
+def test_in_and_or_filters_match_documents(database):
+    async def scenario():
+        await database.predictions.insert_many(make_documents(30))
+        found = await database.predictions.find({"type": {"$in": ["gender", "genetic"]}}).to_list(None)
+        assert {document["type"] for document in found} == {"gender", "genetic"}
+        assert len(found) == 20
+        either = {"$or": [{"id": "pred-001"}, {"type": "genetic", "timestamp": {"$lt": START + timedelta(seconds=2)}}]}
+        found = await database.predictions.find(either).to_list(None)
+        assert sorted(document["id"] for document in found) == ["pred-001", "pred-002", "pred-005"]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("prediction_type", [None, "traits"])
+def test_keyset_pages_cover_every_document_once(database, prediction_type):
+    async def scenario():
+        documents = make_documents(50)
+        await database.predictions.insert_many(documents)
+        expected = sorted(
+            (d for d in documents if prediction_type in (None, d["type"])),
+            key=lambda d: (d["timestamp"], d["id"]),
+            reverse=True,
+        )
+        pages, last = [], None
+        while True:
+            page = await database.predictions.find(keyset_query(last, prediction_type), {"_id": 0}) \
+                .sort([("timestamp", -1), ("id", -1)]).limit(7).to_list(7)
+            if not page:
+                break
+            pages.append(page)
+            last = page[-1]
+        seen = [document["id"] for page in pages for document in page]
+        assert seen == [document["id"] for document in expected]
+        assert all(len(page) == 7 for page in pages[:-1])
+
+    asyncio.run(scenario())
+
+
+def test_projection_drops_nested_fields(database):
+    async def scenario():
+        await database.predictions.insert_many(make_documents(1))
+        [document] = await database.predictions.find({}, {"_id": 0, "result.explanation": 0}).to_list(None)
+        assert document["result"] == {"score": 0}
+        assert document["timestamp"] == START
+
+    asyncio.run(scenario())
+
+
+def test_aware_datetimes_compare_as_utc(database):
+    async def scenario():
+        await database.predictions.insert_many(make_documents(9))
+        plus_five = timezone(timedelta(hours=5))
+        # 17:00:01 at +05:00 is 12:00:01 UTC: the last six documents
+        since = (START + timedelta(seconds=1)).replace(tzinfo=timezone.utc).astimezone(plus_five)
+        found = await database.predictions.find({"timestamp": {"$gte": since}}).to_list(None)
+        assert len(found) == 6
+        naive = await database.predictions.find({"timestamp": {"$gte": START + timedelta(seconds=1)}}).to_list(None)
+        assert [d["id"] for d in found] == [d["id"] for d in naive]
+
+    asyncio.run(scenario())
+
+
+def test_history_cursor_with_offset_decodes_to_naive_utc():
+    pytest.importorskip("fastapi")
+    import server
+
+    aware = datetime(2024, 1, 1, 17, 0, tzinfo=timezone(timedelta(hours=5)))
+    cursor = server.encode_history_cursor({"timestamp": aware, "id": "pred-001"})
+    assert server.decode_history_cursor(cursor) == (datetime(2024, 1, 1, 12, 0), "pred-001")
@@ -0,0 +1,35 @@
+import pytest
+
+from traits_prediction_logic import predict_traits, validate_trait_values
+
+
+def test_missing_traits_use_defaults():
+    assert validate_trait_values({}) == {}
+    result = predict_traits({}, {"eyeColor": "Blue"}, language="en")
+    assert set(result["percentages"]) == {"hair", "eye", "skin", "height"}
+
+
+def test_values_are_normalized_before_checking():
+    traits = {"eyeColor": "Blue", "hairColor": "black"}
+    assert validate_trait_values(traits) is traits
+
+
+@pytest.mark.parametrize("value", [None, "purple", 3])
+def test_invalid_values_are_rejected(value):
+    with pytest.raises(ValueError, match="eyeColor must be one of"):
+        validate_trait_values({"eyeColor": value})
+
+
+@pytest.mark.parametrize("path", ["/api/predict-traits", "/api/predict-traits/simulate"])
+def test_null_trait_is_a_validation_error_not_a_server_error(path):
+    fastapi = pytest.importorskip("fastapi.testclient")
+    import server
+
+    response = fastapi.TestClient(server.app).post(path, json={
+        "mother_traits": {"eyeColor": None},
+        "father_traits": {"eyeColor": "blue"},
+        "language": "en",
+    })
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "mother_traits"]
+    assert "eyeColor must be one of" in response.text